@@ -0,0 +1,220 @@
+import contextlib
+import json
+import os
+import stat
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+
+from scaleai_related_scripts.gt_index import LANE_CHANGE_CSV_FILENAME
+
+FETCH_SCRIPT_FILENAME = "fetch_merged_scale_response.py"
+DETECTOR_BINARY_PATH = (
+    "bazel-bin/application/adp_fca/tools/eval/examples/object_prediction_gt_example"
+)
+
+# Stand-in for the Scale script: copies the pre-generated folder of the task into the cwd,
+# like the real script downloads it there.
+FAKE_FETCH_SCRIPT = """\
+import argparse
+import shutil
+import sys
+import time
+from pathlib import Path
+
+SOURCE_PATH = Path({source_path!r})
+LATENCY_S = {latency_s!r}
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--scale_task_id", required=True)
+args = parser.parse_args()
+time.sleep(LATENCY_S)
+source_folder = SOURCE_PATH / args.scale_task_id
+if not source_folder.is_dir():
+    print(f"Unknown task id {{args.scale_task_id}}", file=sys.stderr)
+    sys.exit(1)
+destination_folder = Path(args.scale_task_id)
+if destination_folder.exists():
+    shutil.rmtree(destination_folder)
+shutil.copytree(source_folder, destination_folder)
+"""
+
+# Stand-in for the built object_prediction_gt_example: reads the GT and writes the lane change csv
+FAKE_DETECTOR_SCRIPT = """\
+#!{python}
+import argparse
+import csv
+import gzip
+import json
+from pathlib import Path
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--json", nargs="+", default=[])
+parser.add_argument("--json-list", default=None)
+parser.add_argument("--failed-list", default=None)
+args = parser.parse_args()
+json_files = list(args.json)
+if args.json_list:
+    with open(args.json_list) as file:
+        json_files.extend(line.strip() for line in file if line.strip())
+for json_file in json_files:
+    if json_file.endswith(".gz"):
+        file = gzip.open(json_file, "rt", encoding="utf-8")
+    elif json_file.endswith(".zst"):
+        import zstandard
+
+        file = zstandard.open(json_file, "rt", encoding="utf-8")
+    else:
+        file = open(json_file)
+    with file:
+        data = json.load(file)
+    with open(Path(json_file).parent / {csv_filename!r}, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["object_id", "timestamp", "is_right_lane_change", "is_left_lane_change"])
+        for annotation in data.get("annotations", []):
+            writer.writerow([annotation["id"], annotation["timestamp"], False, False])
+if args.failed_list:
+    open(args.failed_list, "w").close()
+"""
+
+# Stand-in for bazel: `bazel build` succeeds, `bazel run <target> -- <args>` runs the fake binary
+FAKE_BAZEL_SCRIPT = """\
+#!/bin/sh
+if [ "$1" = "run" ]; then
+    while [ "$#" -gt 0 ] && [ "$1" != "--" ]; do shift; done
+    shift
+    exec "{binary_path}" "$@"
+fi
+exit 0
+"""
+
+
+def write_executable(path: Path, content: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def create_fake_scale_script_dir(
+    script_dir: Path, source_path: Path, latency_s: float = 0.0
+) -> Path:
+    """Creates a Scale script dir whose fetch script serves the task folders under `source_path`."""
+    script_dir.mkdir(parents=True, exist_ok=True)
+    (script_dir / FETCH_SCRIPT_FILENAME).write_text(
+        FAKE_FETCH_SCRIPT.format(source_path=str(source_path.resolve()), latency_s=latency_s)
+    )
+    return script_dir
+
+
+def create_fake_ddad(ddad_dir: Path) -> Path:
+    """Creates a ddad dir with a built detector binary and returns the dir holding a fake `bazel`.
+
+    Put the returned dir in front of PATH while the detector runs.
+    """
+    binary_path = ddad_dir / DETECTOR_BINARY_PATH
+    write_executable(
+        binary_path,
+        FAKE_DETECTOR_SCRIPT.format(python=sys.executable, csv_filename=LANE_CHANGE_CSV_FILENAME),
+    )
+    bin_dir = ddad_dir / "fake_bin"
+    write_executable(
+        bin_dir / "bazel", FAKE_BAZEL_SCRIPT.format(binary_path=binary_path.resolve())
+    )
+    return bin_dir
+
+
+@contextlib.contextmanager
+def prepend_to_path(directory: Path):
+    """Puts `directory` in front of PATH for the duration of the block."""
+    previous_path = os.environ.get("PATH", "")
+    os.environ["PATH"] = str(directory) + os.pathsep + previous_path
+    try:
+        yield
+    finally:
+        os.environ["PATH"] = previous_path
+
+
+class BenchmarkHTTPServer(ThreadingHTTPServer):
+    # The default backlog of 5 refuses connections when many workers connect at once
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class FakeRaasServer:
+    """In-process RAAS stand-in: POST /v1/jobs creates a job, GET /v1/jobs/<id> reports it as completed.
+
+    A POST repeating the `Idempotency-Key` of an earlier one returns the earlier job.
+    `latency_s` delays every response to mimic the round trip to the real endpoint.
+    """
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.jobs: Dict[str, dict] = {}
+        self.jobs_by_idempotency_key: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.server = BenchmarkHTTPServer(("127.0.0.1", 0), self.handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/v1/jobs"
+
+    def handler_class(self):
+        fake_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def send_json(self, status_code: int, data: dict):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                time.sleep(fake_server.latency_s)
+                request_body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                idempotency_key = self.headers.get("Idempotency-Key")
+                with fake_server._lock:
+                    job = fake_server.jobs_by_idempotency_key.get(idempotency_key)
+                    if job is None:
+                        job = {
+                            "id": uuid.uuid4().hex,
+                            "status": "SUBMITTED",
+                            "session": request_body["session"],
+                        }
+                        fake_server.jobs[job["id"]] = job
+                        if idempotency_key:
+                            fake_server.jobs_by_idempotency_key[idempotency_key] = job
+                self.send_json(201, job)
+
+            def do_GET(self):
+                time.sleep(fake_server.latency_s)
+                job_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+                with fake_server._lock:
+                    job = fake_server.jobs.get(job_id)
+                if job is None:
+                    self.send_json(404, {"error": f"Unknown job {job_id}"})
+                    return
+                self.send_json(
+                    200,
+                    {**job, "status": "COMPLETED", "output_path": f"/raas/{job_id}.parquet"},
+                )
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,426 @@
+import argparse
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.fake_tools import (
+    FakeRaasServer,
+    create_fake_ddad,
+    create_fake_scale_script_dir,
+    prepend_to_path,
+)
+from benchmarks.synthetic_gt import generate_dataset
+from compare_jsons.compare_jsons import build_report, get_session_ids, load_snapshot_session_ids
+from scaleai_related_scripts.fetch_manifest import FetchManifest
+from scaleai_related_scripts.gt_compressor import compress_json_files, find_plain_json_files
+from scaleai_related_scripts.gt_index import POSES_FILENAME, GTIndex
+from scaleai_related_scripts.gt_storage import COMPRESSION_SUFFIXES
+from scaleai_related_scripts.json_fetcher import JsonFetcher
+from scaleai_related_scripts.lane_change_detector_runner import LaneChangeDetectorRunner
+from scaleai_related_scripts.lane_change_stats import LaneChangeStats
+from scaleai_related_scripts.parquet_creator import GTFinder, ParquetCreator
+from scaleai_related_scripts.pose_remover import remove_poses_json
+from scaleai_related_scripts.raas_job_ledger import RaasJobLedger
+from scaleai_related_scripts.raas_submitter import RaasJobSubmitter
+
+DEFAULT_SESSION_COUNTS = [100, 1000, 10000]
+BENCHMARK_GROUPS = ["finder", "compare", "index", "stats", "raas", "fetch", "detect", "remove_poses"]
+# A benchmark counts as regressed if it is this much slower than the baseline ...
+DEFAULT_TOLERANCE = 0.25
+# ... and slower by more than this, so that timer noise on tiny benchmarks is ignored
+NOISE_FLOOR_S = 0.05
+
+
+class BenchmarkRun:
+    """Runs the selected benchmark groups over one synthetic dataset of `sessions` sessions."""
+
+    def __init__(
+        self,
+        work_dir: Path,
+        sessions: int,
+        groups: List[str],
+        logger: logging.Logger,
+        frames: int = 50,
+        objects_per_frame: int = 5,
+        workers: int = 8,
+        fetch_latency_s: float = 0.0,
+        raas_latency_s: float = 0.0,
+        compression: Optional[str] = None,
+    ):
+        self.work_dir = work_dir
+        self.sessions = sessions
+        self.groups = groups
+        self.logger = logger
+        self.frames = frames
+        self.objects_per_frame = objects_per_frame
+        self.workers = workers
+        self.fetch_latency_s = fetch_latency_s
+        self.raas_latency_s = raas_latency_s
+        self.compression = compression
+        self.gt_path = work_dir / "gt"
+        # Second snapshot for compare_jsons, sharing half of its sessions with the first one
+        self.other_snapshot_path = work_dir / "gt_other_snapshot"
+        self.results: List[dict] = []
+        self.task_ids: List[str] = []
+        self.gt_index: Optional[GTIndex] = None
+
+    def time(self, name: str, function: Callable[[], Optional[dict]]):
+        start = time.perf_counter()
+        details = function() or {}
+        seconds = time.perf_counter() - start
+        self.results.append(
+            {"benchmark": name, "sessions": self.sessions, "seconds": seconds, **details}
+        )
+        print(f"{self.sessions:>7} sessions  {name:<32}{seconds:>10.3f} s", flush=True)
+
+    def generate(self):
+        def generate_snapshots():
+            self.task_ids = generate_dataset(
+                self.gt_path,
+                self.sessions,
+                frames=self.frames,
+                objects_per_frame=self.objects_per_frame,
+            )
+            if "compare" in self.groups:
+                generate_dataset(
+                    self.other_snapshot_path,
+                    self.sessions,
+                    first_session_index=self.sessions // 2,
+                    frames=self.frames,
+                    objects_per_frame=self.objects_per_frame,
+                    with_poses=False,
+                    with_lane_change_csv=False,
+                )
+
+        self.time("generate_synthetic_gt", generate_snapshots)
+        if self.compression:
+            self.time("compress_gt", self.compress_snapshots)
+
+    def compress_snapshots(self) -> dict:
+        results = []
+        for snapshot_path in (self.gt_path, self.other_snapshot_path):
+            if snapshot_path.is_dir():
+                results.extend(
+                    compress_json_files(
+                        find_plain_json_files(snapshot_path), self.compression, max_workers=self.workers
+                    )
+                )
+        return {
+            "bytes_before": sum(size for _, size, _ in results),
+            "bytes_after": sum(size for _, _, size in results),
+        }
+
+    def run(self) -> List[dict]:
+        self.generate()
+        if "finder" in self.groups:
+            self.time(
+                "gt_finder_walk",
+                lambda: {"files": len(GTFinder(str(self.gt_path), self.logger).find_gt_files())},
+            )
+        if "compare" in self.groups:
+            self.bench_compare()
+        # Kept outside the snapshot, so it never collides with the index compare_jsons keeps there
+        self.gt_index = GTIndex(
+            self.gt_path, self.logger, index_path=str(self.work_dir / "benchmark_index.sqlite")
+        )
+        if "index" in self.groups:
+            self.time("gt_index_scan_cold", lambda: self.gt_index.scan(max_workers=self.workers))
+            self.time("gt_index_scan_warm", lambda: self.gt_index.scan(max_workers=self.workers))
+        else:
+            self.gt_index.scan(max_workers=self.workers)
+        if "finder" in self.groups:
+            self.time(
+                "gt_finder_indexed",
+                lambda: {
+                    "files": len(
+                        GTFinder(str(self.gt_path), self.logger, self.gt_index).find_gt_files()
+                    )
+                },
+            )
+        if "stats" in self.groups:
+            self.bench_stats()
+        if "raas" in self.groups:
+            self.bench_raas()
+        if "fetch" in self.groups:
+            self.bench_fetch()
+        if "detect" in self.groups:
+            self.bench_detect()
+        if "remove_poses" in self.groups:
+            self.bench_remove_poses()
+        self.gt_index.close()
+        return self.results
+
+    def bench_compare(self):
+        snapshots = [self.gt_path, self.other_snapshot_path]
+
+        def compare_walk():
+            report = build_report({str(path): get_session_ids(path) for path in snapshots})
+            return {"common_sessions": len(report["intersection"])}
+
+        def compare_indexed():
+            report = build_report(
+                {str(path): load_snapshot_session_ids(path, max_age_s=0) for path in snapshots}
+            )
+            return {"common_sessions": len(report["intersection"])}
+
+        self.time("compare_jsons_walk", compare_walk)
+        self.time("compare_jsons_indexed_cold", compare_indexed)
+        self.time("compare_jsons_indexed_warm", compare_indexed)
+
+    def bench_stats(self):
+        cache_path = self.work_dir / "lane_change_stats_cache"
+
+        def lane_change_stats():
+            return LaneChangeStats(
+                self.gt_path,
+                self.logger,
+                self.gt_index,
+                cache_path=str(cache_path),
+                max_workers=self.workers,
+            )
+
+        def count_total():
+            right, left = lane_change_stats().count_total()
+            return {"right": right, "left": left}
+
+        def count_per_session():
+            containing_info, missing_dirs = lane_change_stats().count_per_session()
+            return {"containing": len(containing_info), "missing": len(missing_dirs)}
+
+        self.time("lane_change_stat_cold", count_total)
+        self.time("lane_change_stat_warm", count_total)
+        self.time("sessions_missing_lane_change_warm", count_per_session)
+
+    def bench_raas(self):
+        with FakeRaasServer(self.raas_latency_s) as server:
+            submitter = RaasJobSubmitter(
+                "benchmark",
+                "benchmark",
+                self.logger,
+                server.url,
+                max_workers=self.workers,
+                rate_per_s=1_000_000,
+                burst=self.workers,
+            )
+            parquet_creator = ParquetCreator(
+                str(self.gt_path),
+                "benchmark",
+                "benchmark",
+                GTFinder(str(self.gt_path), self.logger, self.gt_index),
+                self.logger,
+                submitter=submitter,
+                ledger=RaasJobLedger(
+                    str(self.gt_path), ledger_path=str(self.work_dir / "raas_jobs.sqlite")
+                ),
+            )
+
+            def submit():
+                parquet_creator.run()
+                return {"jobs": len(server.jobs)}
+
+            self.time("raas_submit", submit)
+            self.time("raas_poll", lambda: parquet_creator.poll_jobs(interval_s=0))
+            submitter.close()
+            parquet_creator.ledger.close()
+
+    def fetch_destination(self) -> Path:
+        return self.work_dir / "fetched"
+
+    def bench_fetch(self):
+        script_dir = create_fake_scale_script_dir(
+            self.work_dir / "scale_scripts", self.gt_path, self.fetch_latency_s
+        )
+
+        def fetch(destination=self.fetch_destination(), backend=JsonFetcher.FetchBackend.SUBPROCESS):
+            json_fetcher = JsonFetcher(
+                str(script_dir),
+                self.task_ids,
+                self.logger,
+                str(destination),
+                max_workers=self.workers,
+                manifest=FetchManifest(str(destination), self.logger),
+                transfer_mode=JsonFetcher.TransferMode.MOVE,
+                exclude_patterns=[POSES_FILENAME],
+                fetch_backend=backend,
+            )
+            json_fetcher.run()
+            failed = sum(
+                1
+                for _, result in json_fetcher.result_list
+                if result != JsonFetcher.FetchResult.SUCCESS
+            )
+            return {"fetched": len(json_fetcher.result_list), "failed": failed}
+
+        self.time("json_fetcher", fetch)
+        self.time("json_fetcher_up_to_date", fetch)
+        self.time(
+            "json_fetcher_workers",
+            lambda: fetch(self.work_dir / "fetched_workers", JsonFetcher.FetchBackend.WORKERS),
+        )
+
+    def bench_detect(self):
+        bin_dir = create_fake_ddad(self.work_dir / "ddad")
+        # The detector runs on the fetched copy if there is one, so the snapshot csv files stay untouched
+        detect_path = self.fetch_destination() if self.fetch_destination().is_dir() else self.gt_path
+
+        def detect():
+            runner = LaneChangeDetectorRunner(
+                self.logger,
+                str(self.work_dir / "ddad"),
+                GTFinder(str(detect_path), self.logger),
+                max_workers=self.workers,
+            )
+            with prepend_to_path(bin_dir):
+                runner.run_parallel()
+            failed = sum(1 for returncode in runner.return_codes.values() if returncode != 0)
+            return {"detected": len(runner.return_codes), "failed": failed}
+
+        self.time("lane_change_detector", detect)
+        self.time("lane_change_detector_up_to_date", detect)
+
+    def bench_remove_poses(self):
+        self.time(
+            "remove_poses_indexed", lambda: remove_poses_json(str(self.gt_path), self.gt_index)
+        )
+        if self.fetch_destination().is_dir():
+            self.time("remove_poses_walk", lambda: remove_poses_json(str(self.fetch_destination())))
+
+
+def find_regressions(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    baseline_seconds: Dict[tuple, float] = {
+        (result["benchmark"], result["sessions"]): result["seconds"] for result in baseline
+    }
+    regressions = []
+    for result in results:
+        previous = baseline_seconds.get((result["benchmark"], result["sessions"]))
+        if previous is None:
+            continue
+        slowdown_s = result["seconds"] - previous
+        if result["seconds"] > previous * (1 + tolerance) and slowdown_s > NOISE_FLOOR_S:
+            regressions.append(
+                f"{result['benchmark']} at {result['sessions']} sessions: "
+                f"{result['seconds']:.3f} s, baseline {previous:.3f} s"
+            )
+    return regressions
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the GT pipeline on synthetic data with stand-ins for Scale, the detector and RAAS."
+    )
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SESSION_COUNTS,
+        help="Dataset sizes to benchmark, in sessions",
+    )
+    parser.add_argument(
+        "--groups",
+        nargs="+",
+        choices=BENCHMARK_GROUPS,
+        default=BENCHMARK_GROUPS,
+        help="Benchmark groups to run",
+    )
+    parser.add_argument("--frames", type=int, default=50, help="Frames per synthetic GT file")
+    parser.add_argument("--objects-per-frame", type=int, default=5, help="Objects per frame")
+    parser.add_argument(
+        "--workers", type=int, default=8, help="Worker count passed to the pipeline classes"
+    )
+    parser.add_argument(
+        "--fetch-latency",
+        type=float,
+        default=0.0,
+        help="Seconds the fake Scale script sleeps per task",
+    )
+    parser.add_argument(
+        "--raas-latency",
+        type=float,
+        default=0.0,
+        help="Seconds the fake RAAS endpoint sleeps per request",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=sorted(COMPRESSION_SUFFIXES),
+        default=None,
+        help="Store the synthetic GT JSON files compressed",
+    )
+    parser.add_argument(
+        "--work-dir",
+        type=Path,
+        default=None,
+        help="Directory for the synthetic data; a temporary directory that is removed afterwards by default",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=None, help="JSON file the results are written to"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="Results of an earlier run; exit with 1 if a benchmark regressed against it",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Relative slowdown against the baseline that counts as a regression",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    # The pipeline classes log every file; at benchmark scale that would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger("benchmarks")
+
+    work_dir = args.work_dir or Path(tempfile.mkdtemp(prefix="gt_pipeline_benchmarks_"))
+    results = []
+    try:
+        for sessions in args.sessions:
+            run_dir = work_dir / f"sessions_{sessions}"
+            if run_dir.exists():
+                shutil.rmtree(run_dir)
+            run_dir.mkdir(parents=True)
+            results.extend(
+                BenchmarkRun(
+                    run_dir,
+                    sessions,
+                    args.groups,
+                    logger,
+                    frames=args.frames,
+                    objects_per_frame=args.objects_per_frame,
+                    workers=args.workers,
+                    fetch_latency_s=args.fetch_latency,
+                    raas_latency_s=args.raas_latency,
+                    compression=args.compression,
+                ).run()
+            )
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import csv
+import json
+import random
+from pathlib import Path
+from typing import List, Optional
+
+from scaleai_related_scripts.gt_index import LANE_CHANGE_CSV_FILENAME, POSES_FILENAME
+
+MERGED_GT_FILENAME = "merged_response.json"
+# 10 Hz frames, like the Scale annotations
+FRAME_INTERVAL_NS = 100_000_000
+
+
+def task_id_for(session_index: int) -> str:
+    """Returns a Scale-like task id (24 hex digits) that is stable for the session index."""
+    return f"{session_index:024x}"
+
+
+def session_id_for(session_index: int) -> str:
+    return f"session_{session_index:06d}"
+
+
+def build_merged_gt(
+    session_index: int,
+    rng: random.Random,
+    frames: int,
+    objects_per_frame: int,
+    metadata_last: bool = False,
+) -> dict:
+    """Returns a merged GT JSON with `frames` frames of `objects_per_frame` cuboids each.
+
+    With `metadata_last` the `metadata` key follows the annotations, which forces the
+    streaming metadata reader past the peek window on large files.
+    """
+    start_timestamp = 1_700_000_000_000_000_000 + session_index * 3_600_000_000_000
+    annotations = []
+    for frame in range(frames):
+        timestamp = start_timestamp + frame * FRAME_INTERVAL_NS
+        for object_id in range(objects_per_frame):
+            annotations.append(
+                {
+                    "id": f"{session_index}-{object_id}",
+                    "timestamp": timestamp,
+                    "label": rng.choice(["car", "truck", "pedestrian", "cyclist"]),
+                    "position": {
+                        "x": round(rng.uniform(-80, 80), 3),
+                        "y": round(rng.uniform(-20, 20), 3),
+                        "z": round(rng.uniform(-1, 1), 3),
+                    },
+                    "dimensions": {
+                        "x": round(rng.uniform(0.5, 12), 3),
+                        "y": round(rng.uniform(0.5, 3), 3),
+                        "z": round(rng.uniform(1, 4), 3),
+                    },
+                    "yaw": round(rng.uniform(-3.14, 3.14), 4),
+                }
+            )
+    metadata = {
+        "session_id": session_id_for(session_index),
+        "start_timestamp": start_timestamp,
+        "end_timestamp": start_timestamp + max(frames - 1, 0) * FRAME_INTERVAL_NS,
+        "task_id": task_id_for(session_index),
+    }
+    lanes = [
+        {"id": lane_id, "points": [[rng.uniform(-100, 100), lane_id * 3.5] for _ in range(20)]}
+        for lane_id in range(4)
+    ]
+    if metadata_last:
+        return {"annotations": annotations, "lanes": lanes, "metadata": metadata}
+    return {"metadata": metadata, "annotations": annotations, "lanes": lanes}
+
+
+def build_poses(session_index: int, rng: random.Random, frames: int) -> list:
+    start_timestamp = 1_700_000_000_000_000_000 + session_index * 3_600_000_000_000
+    return [
+        {
+            "timestamp": start_timestamp + frame * FRAME_INTERVAL_NS,
+            "position": [frame * 2.5, rng.uniform(-0.5, 0.5), 0.0],
+            "heading": rng.uniform(-0.1, 0.1),
+        }
+        for frame in range(frames)
+    ]
+
+
+def write_lane_change_csv(
+    csv_path: Path, merged_gt: dict, rng: random.Random, lane_change_rate: float = 0.02
+):
+    """Writes a lane change csv like the detector does: one row per annotation with both flags."""
+    with open(csv_path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(
+            ["object_id", "timestamp", "label", "is_right_lane_change", "is_left_lane_change"]
+        )
+        for annotation in merged_gt["annotations"]:
+            lane_change = rng.random() < lane_change_rate
+            right = lane_change and rng.random() < 0.5
+            writer.writerow(
+                [
+                    annotation["id"],
+                    annotation["timestamp"],
+                    annotation["label"],
+                    right,
+                    lane_change and not right,
+                ]
+            )
+
+
+def generate_task_folder(
+    task_folder: Path,
+    session_index: int,
+    frames: int = 50,
+    objects_per_frame: int = 5,
+    with_poses: bool = True,
+    with_lane_change_csv: bool = True,
+    metadata_last: bool = False,
+    seed: int = 0,
+):
+    """Writes the folder of one Scale task: merged GT JSON, `poses.json` and the detector csv."""
+    rng = random.Random(seed * 1_000_003 + session_index)
+    task_folder.mkdir(parents=True, exist_ok=True)
+    merged_gt = build_merged_gt(session_index, rng, frames, objects_per_frame, metadata_last)
+    with open(task_folder / MERGED_GT_FILENAME, "w") as file:
+        json.dump(merged_gt, file)
+    if with_poses:
+        with open(task_folder / POSES_FILENAME, "w") as file:
+            json.dump(build_poses(session_index, rng, frames), file)
+    if with_lane_change_csv:
+        write_lane_change_csv(task_folder / LANE_CHANGE_CSV_FILENAME, merged_gt, rng)
+
+
+def generate_dataset(
+    base_path: Path,
+    sessions: int,
+    first_session_index: int = 0,
+    frames: int = 50,
+    objects_per_frame: int = 5,
+    with_poses: bool = True,
+    with_lane_change_csv: bool = True,
+    metadata_last_every: Optional[int] = 10,
+    seed: int = 0,
+) -> List[str]:
+    """Writes `sessions` task folders under `base_path` and returns their task ids.
+
+    Every `metadata_last_every`-th GT file has its metadata at the end of the file.
+    """
+    base_path.mkdir(parents=True, exist_ok=True)
+    task_ids = []
+    for session_index in range(first_session_index, first_session_index + sessions):
+        task_id = task_id_for(session_index)
+        generate_task_folder(
+            base_path / task_id,
+            session_index,
+            frames=frames,
+            objects_per_frame=objects_per_frame,
+            with_poses=with_poses,
+            with_lane_change_csv=with_lane_change_csv,
+            metadata_last=bool(metadata_last_every) and session_index % metadata_last_every == 0,
+            seed=seed,
+        )
+        task_ids.append(task_id)
+    return task_ids
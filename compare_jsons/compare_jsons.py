@@ -1,35 +1,137 @@
+import argparse
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
 from pathlib import Path
+from typing import Dict, Optional
+from scaleai_related_scripts.gt_index import GTIndex, INDEX_MAX_AGE_S
+from scaleai_related_scripts.gt_metadata import read_gt_metadata
+from scaleai_related_scripts.gt_storage import find_json_files
 
-def get_session_ids(directory: Path):
+# Update these paths to your specific directories containing JSON files
+DEFAULT_DIRECTORIES = [
+    Path("/home/sc62291/stla/gt_to_explore_28_02_2025"),
+    Path("/home/sc62291/stla/gt_to_explore_perception_with_lane_change_06_03_2025"),
+]
+
+def get_session_ids(directory: Path, gt_index: Optional[GTIndex] = None):
     """Extracts session_ids from all JSON files in a given directory and its subdirectories."""
+    if gt_index:
+        return gt_index.session_ids()
+
     session_ids = set()
-    # Using '**/*.json' to recursively find all JSON files in the directory
-    for json_file in directory.glob("**/*.json"):
+    # Recursively finds all plain and compressed JSON files in the directory
+    for json_file in find_json_files(directory):
         try:
-            with json_file.open(encoding='utf-8') as f:
-                data = json.load(f)
-                if isinstance(data, dict) and "metadata" in data and "session_id" in data["metadata"]:
-                    session_ids.add(data["metadata"]["session_id"])
+            metadata = read_gt_metadata(json_file)
+            if metadata and "session_id" in metadata:
+                session_ids.add(metadata["session_id"])
         except Exception as e:
             print(f"Error processing file {json_file}: {e}")
     return session_ids
 
+def load_snapshot_session_ids(directory: Path, max_age_s: Optional[float] = None) -> set:
+    """Returns the session ids of one snapshot from its GT index, after an incremental scan.
+
+    With `max_age_s`, an index younger than that is used without scanning.
+
+    Each call opens its own index, so snapshots can be loaded from separate threads.
+    """
+    gt_index = GTIndex(directory, logging.getLogger(__name__))
+    try:
+        gt_index.scan_if_stale(max_age_s)
+        return get_session_ids(directory, gt_index)
+    finally:
+        gt_index.close()
+
+def build_report(session_ids_by_snapshot: Dict[str, set]) -> dict:
+    """Returns per-snapshot counts, pairwise intersections and differences, and the overall union and intersection."""
+    snapshots = list(session_ids_by_snapshot)
+    all_sets = list(session_ids_by_snapshot.values())
+    report = {
+        "snapshots": {
+            name: {"session_count": len(session_ids)}
+            for name, session_ids in session_ids_by_snapshot.items()
+        },
+        "pairs": [],
+        "union": sorted(set().union(*all_sets)) if all_sets else [],
+        "intersection": sorted(set.intersection(*all_sets)) if all_sets else [],
+    }
+    for first, second in combinations(snapshots, 2):
+        first_ids = session_ids_by_snapshot[first]
+        second_ids = session_ids_by_snapshot[second]
+        report["pairs"].append(
+            {
+                "first": first,
+                "second": second,
+                "intersection": sorted(first_ids & second_ids),
+                "only_in_first": sorted(first_ids - second_ids),
+                "only_in_second": sorted(second_ids - first_ids),
+            }
+        )
+    return report
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Compare the session ids of several GT snapshot directories."
+    )
+    parser.add_argument(
+        "directories",
+        type=Path,
+        nargs="*",
+        default=DEFAULT_DIRECTORIES,
+        help="Snapshot directories containing GT JSON files",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Path of the JSON file the structured report is written to",
+    )
+    parser.add_argument(
+        "--max-index-age",
+        type=float,
+        default=INDEX_MAX_AGE_S,
+        help="Reuse a snapshot index younger than this many seconds instead of rescanning it; "
+        "by default every snapshot is rescanned incrementally",
+    )
+    return parser.parse_args()
+
 def main():
-    # Update these paths to your specific directories containing JSON files
-    directory1 = Path("/home/sc62291/stla/gt_to_explore_28_02_2025")
-    directory2 = Path("/home/sc62291/stla/gt_to_explore_perception_with_lane_change_06_03_2025")
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO)
 
-    # Retrieve session_ids from each directory
-    session_ids_dir1 = get_session_ids(directory1)
-    session_ids_dir2 = get_session_ids(directory2)
+    # Each snapshot has its own incremental index, and the snapshots are loaded in parallel
+    with ThreadPoolExecutor(max_workers=len(args.directories) or 1) as executor:
+        session_id_sets = list(
+            executor.map(
+                lambda directory: load_snapshot_session_ids(directory, args.max_index_age),
+                args.directories,
+            )
+        )
+    session_ids_by_snapshot = {
+        str(directory): session_ids
+        for directory, session_ids in zip(args.directories, session_id_sets)
+    }
+    report = build_report(session_ids_by_snapshot)
 
-    # Find common session_ids between the two sets
-    common_session_ids = session_ids_dir1.intersection(session_ids_dir2)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Report written to {args.output}")
 
-    if common_session_ids:
+    for name, summary in report["snapshots"].items():
+        print(f"{name}: {summary['session_count']} session_ids")
+    for pair in report["pairs"]:
+        print(
+            f"{pair['first']} vs {pair['second']}: {len(pair['intersection'])} common, "
+            f"{len(pair['only_in_first'])} only in first, {len(pair['only_in_second'])} only in second"
+        )
+    print(f"Union of all snapshots: {len(report['union'])} session_ids")
+    if report["intersection"]:
         print("Common session_ids found:")
-        for session_id in common_session_ids:
+        for session_id in report["intersection"]:
             print(session_id)
     else:
         print("No common session_ids found.")
@@ -0,0 +1,37 @@
+import argparse
+import logging
+from pathlib import Path
+from scaleai_related_scripts.gt_compressor import compress_json_files, find_plain_json_files
+from scaleai_related_scripts.gt_storage import COMPRESSION_SUFFIXES, COMPRESSION_ZSTD
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Replace the plain JSON files of a GT snapshot by zstd or gzip compressed copies."
+    )
+    parser.add_argument("directory", type=Path, help="Snapshot directory, e.g. a gt_to_explore_<date> directory")
+    parser.add_argument(
+        "--compression",
+        choices=sorted(COMPRESSION_SUFFIXES),
+        default=COMPRESSION_ZSTD,
+        help="Compression format of the copies",
+    )
+    parser.add_argument("--level", type=int, default=None, help="Compression level")
+    parser.add_argument("--workers", type=int, default=8, help="Number of files compressed in parallel")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO)
+    json_files = find_plain_json_files(args.directory)
+    print(f"Compressing {len(json_files)} JSON files in {args.directory} with {args.compression}")
+    results = compress_json_files(json_files, args.compression, args.level, args.workers)
+    size_before = sum(size for _, size, _ in results)
+    size_after = sum(size for _, _, size in results)
+    ratio = size_before / size_after if size_after else 0
+    print(f"Compressed {size_before / 1e6:.1f} MB to {size_after / 1e6:.1f} MB ({ratio:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 import logging
 from pathlib import Path
-import pandas as pd
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+from scaleai_related_scripts.gt_index import GTIndex, INDEX_MAX_AGE_S
+from scaleai_related_scripts.lane_change_stats import LaneChangeStats
 
 # Hardcoded base directory
 # BASE_PATH = Path("/home/sc62291/stla/gt_to_explore_23_04_2025")  # <-- Change this to your desired root directory
@@ -22,7 +23,8 @@ logger = logging.getLogger(__name__)
 
 def find_and_count_gt_first_level(
     base_path: Path,
-    target_filename: str
+    target_filename: str,
+    gt_index: Optional[GTIndex] = None,
 ) -> Tuple[List[Tuple[Path, int, int]], List[Path]]:
     """
     Check only the first-level subdirectories under `base_path`, categorize them
@@ -31,31 +33,8 @@ def find_and_count_gt_first_level(
       - containing_info: list of tuples (dir, right_count, left_count)
       - missing_dirs: list of dirs missing the file
     """
-    containing_info: List[Tuple[Path, int, int]] = []
-    missing_dirs: List[Path] = []
-
-    for entry in base_path.iterdir():
-        if entry.is_dir():
-            file_path = entry / target_filename
-            if file_path.exists():
-                right_count = 0
-                left_count = 0
-                try:
-                    df = pd.read_csv(file_path)
-                    if 'is_right_lane_change' in df.columns:
-                        right_count = int((df['is_right_lane_change'] == True).sum())
-                    else:
-                        logger.warning(f"'is_right_lane_change' column not found in {file_path}")
-                    if 'is_left_lane_change' in df.columns:
-                        left_count = int((df['is_left_lane_change'] == True).sum())
-                    else:
-                        logger.warning(f"'is_left_lane_change' column not found in {file_path}")
-                except Exception as e:
-                    logger.error(f"Error reading {file_path}: {e}")
-                containing_info.append((entry, right_count, left_count))
-            else:
-                missing_dirs.append(entry)
-    return containing_info, missing_dirs
+    lane_change_stats = LaneChangeStats(base_path, logger, gt_index)
+    return lane_change_stats.count_per_session(target_filename)
 
 
 def main() -> None:
@@ -65,7 +44,9 @@ def main() -> None:
         return
 
     logger.info(f"Scanning first-level subdirectories of '{BASE_PATH}' for '{TARGET_FILENAME}'...")
-    containing_info, missing = find_and_count_gt_first_level(BASE_PATH, TARGET_FILENAME)
+    gt_index = GTIndex(BASE_PATH, logger)
+    gt_index.scan_if_stale(INDEX_MAX_AGE_S)
+    containing_info, missing = find_and_count_gt_first_level(BASE_PATH, TARGET_FILENAME, gt_index)
 
     logger.info(f"Found {len(containing_info)} first-level directories containing the file.")
     logger.info(f"Found {len(missing)} first-level directories missing the file.")
@@ -1,21 +1,62 @@
-from scaleai_related_scripts.parquet_creator import ParquetCreator, GTFinder
+from scaleai_related_scripts.parquet_creator import (
+    ParquetCreator,
+    GTFinder,
+    SUBMIT_JOB_URL,
+)
 from scaleai_related_scripts.json_fetcher import JsonFetcher
+from scaleai_related_scripts.fetch_manifest import FetchManifest
+from scaleai_related_scripts.gt_index import GTIndex
+from scaleai_related_scripts.raas_submitter import RaasJobSubmitter
+from scaleai_related_scripts.raas_job_ledger import RaasJobLedger
 from scaleai_related_scripts.lane_change_detector_runner import LaneChangeDetectorRunner
-from scaleai_related_scripts.task_id_list import (
-    list_of_task_ids_legacy,
-    list_of_task_ids_prediction,
-    list_of_task_ids_others,
+from scaleai_related_scripts.task_registry import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUSES,
+    TAG_LEGACY,
+    TaskRegistry,
 )
 from scaleai_related_scripts.pose_remover import remove_poses_json
+from scaleai_related_scripts.gt_compressor import compress_gt_folder
+from scaleai_related_scripts.gt_storage import COMPRESSION_ZSTD
+from scaleai_related_scripts.pipeline_scheduler import PipelineScheduler, Stage
+from scaleai_related_scripts.pipeline_metrics import PipelineMetrics
+from pathlib import Path
 import logging
 import os
 import argparse
+from typing import Optional
 
 # GT_BASE_PATH: str = "/home/sc62291/stla/gt_to_explore_28_02_2025"
 GT_BASE_PATH: str = "/home/sc62291/stla/gt_to_explore_23_04_2025"
 SCALE_AI_SCRIPT_PATH = "/home/sc62291/stla/ScaleAICollaboration"
 DDAD_PATH = "/home/sc62291/stla/ddad"
-LIST_OF_TASK_IDS = list_of_task_ids_legacy
+# Tags of the task registry whose tasks are processed, overridden by --tags
+TASK_TAGS = [TAG_LEGACY]
+FETCH_MAX_WORKERS = 4
+FETCH_TIMEOUT_S = 30 * 60
+FETCH_TRANSFER_MODE = JsonFetcher.TransferMode.MOVE
+# WORKERS loads the Scale fetch script once per worker; SUBPROCESS starts one interpreter per task
+FETCH_BACKEND = JsonFetcher.FetchBackend.WORKERS
+# Files of a fetched task that are never written to GT_BASE_PATH; None includes everything
+FETCH_INCLUDE_PATTERNS = None
+FETCH_EXCLUDE_PATTERNS = ["poses.json"]
+DETECTOR_MAX_WORKERS = os.cpu_count()
+DETECTOR_SESSION_TIMEOUT_S = 15 * 60
+RAAS_MAX_WORKERS = 8
+RAAS_RATE_PER_S = 5.0
+RAAS_WINDOW_GAP_TOLERANCE_NS = 0
+# Format the compress stage stores the GT JSON files in, "zstd" or "gzip"
+GT_COMPRESSION = COMPRESSION_ZSTD
+# Maximum number of tasks waiting between two stages
+STAGE_QUEUE_SIZE = 8
+# Stages that every task flows through on its own, in order
+PER_TASK_STAGES = ["fetch", "remove_poses", "compress", "detect"]
+# Stages that run once over the whole dataset after the per-task stages
+DATASET_STAGES = ["parquet", "poll"]
+DEFAULT_STAGES = ["remove_poses", "detect"]
+METRICS_JSONL_PATH = "ground_truth_pipeline_metrics.jsonl"
+METRICS_PROMETHEUS_PATH = "ground_truth_pipeline_metrics.prom"
 
 
 def parse_arguments():
@@ -28,9 +69,98 @@ def parse_arguments():
         required=True,
         help="Password to authenticate to the RAAS API",
     )
+    parser.add_argument(
+        "--force-refresh",
+        action="store_true",
+        help="Fetch every task again, even the ones the fetch manifest marks as up to date",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run lane change detection for every GT file, even the up-to-date ones",
+    )
+    parser.add_argument(
+        "--stages",
+        type=str,
+        nargs="+",
+        choices=PER_TASK_STAGES + DATASET_STAGES,
+        default=DEFAULT_STAGES,
+        help="Stages to run; fetch, remove_poses, compress and detect stream task by task, "
+        "parquet (RAAS submission) and poll run once at the end",
+    )
+    parser.add_argument(
+        "--tags",
+        type=str,
+        nargs="+",
+        default=TASK_TAGS,
+        help="Process the registry tasks with any of these tags, e.g. legacy prediction others",
+    )
+    parser.add_argument(
+        "--status",
+        type=str,
+        nargs="+",
+        choices=STATUSES,
+        default=None,
+        help="Only process the registry tasks with any of these statuses, e.g. new failed",
+    )
     return parser.parse_args()
 
 
+def build_per_task_stages(
+    enabled_stages,
+    json_fetcher: JsonFetcher,
+    lane_change_detector_runner: LaneChangeDetectorRunner,
+    metrics: PipelineMetrics,
+    missing_task_ids: set,
+):
+    """Returns the enabled per-task stages.
+
+    A task whose folder is not in GT_BASE_PATH is dropped and added to `missing_task_ids`.
+    """
+
+    def task_folder(task_id) -> Optional[Path]:
+        folder = Path(GT_BASE_PATH) / task_id
+        if folder.is_dir():
+            return folder
+        logging.getLogger("main_logger").error(f"Task folder {folder} does not exist, skipping task")
+        missing_task_ids.add(task_id)
+        return None
+
+    def fetch(task_id):
+        _, result = json_fetcher.fetch_task_if_needed(task_id)
+        json_fetcher.result_list.append((task_id, result))
+        return task_id if result == JsonFetcher.FetchResult.SUCCESS else None
+
+    def remove_poses(task_id):
+        folder = task_folder(task_id)
+        if folder is None:
+            return None
+        remove_poses_json(str(folder), metrics=metrics)
+        return task_id
+
+    def compress(task_id):
+        folder = task_folder(task_id)
+        if folder is None:
+            return None
+        compress_gt_folder(folder, GT_COMPRESSION, metrics=metrics)
+        return task_id
+
+    def detect(task_id):
+        folder = task_folder(task_id)
+        if folder is None:
+            return None
+        success = lane_change_detector_runner.detect_in_folder(folder)
+        return task_id if success else None
+
+    stages = {
+        "fetch": Stage("fetch", fetch, FETCH_MAX_WORKERS),
+        "remove_poses": Stage("remove_poses", remove_poses, 1),
+        "compress": Stage("compress", compress, FETCH_MAX_WORKERS),
+        "detect": Stage("detect", detect, DETECTOR_MAX_WORKERS),
+    }
+    return [stages[name] for name in PER_TASK_STAGES if name in enabled_stages]
+
+
 if __name__ == "__main__":
     logging.basicConfig(
         filename="ground_truth_pipeline.log",
@@ -48,18 +178,43 @@ if __name__ == "__main__":
     username = os.getenv("USER")
     args = parse_arguments()
     password = args.password
+    metrics = PipelineMetrics(main_logger, METRICS_JSONL_PATH, METRICS_PROMETHEUS_PATH)
+
+    task_registry = TaskRegistry(GT_BASE_PATH)
+    # The registry lists every task once, so no task is fetched or detected twice
+    task_ids = task_registry.select(args.tags, args.status)
+    main_logger.info(
+        f"Selected {len(task_ids)} of {len(task_registry)} tasks with tags {args.tags} "
+        f"and status {args.status or 'any'}"
+    )
 
     json_fetcher = JsonFetcher(
         scaleai_script_path=SCALE_AI_SCRIPT_PATH,
-        list_of_task_ids=LIST_OF_TASK_IDS,
+        list_of_task_ids=task_ids,
         logger=fetch_gt_logger,
         destination_path=GT_BASE_PATH,
+        max_workers=FETCH_MAX_WORKERS,
+        fetch_timeout_s=FETCH_TIMEOUT_S,
+        manifest=FetchManifest(GT_BASE_PATH, fetch_gt_logger),
+        force_refresh=args.force_refresh,
+        transfer_mode=FETCH_TRANSFER_MODE,
+        metrics=metrics,
+        include_patterns=FETCH_INCLUDE_PATTERNS,
+        exclude_patterns=FETCH_EXCLUDE_PATTERNS,
+        fetch_backend=FETCH_BACKEND,
     )
 
-    gt_finder = GTFinder(GT_BASE_PATH, parquet_creator_logger)
+    gt_index = GTIndex(GT_BASE_PATH, main_logger)
+    gt_finder = GTFinder(GT_BASE_PATH, parquet_creator_logger, gt_index)
 
     lane_change_detector_runner = LaneChangeDetectorRunner(
-        lane_change_detector_runner_logger, DDAD_PATH, gt_finder
+        lane_change_detector_runner_logger,
+        DDAD_PATH,
+        gt_finder,
+        max_workers=DETECTOR_MAX_WORKERS,
+        session_timeout_s=DETECTOR_SESSION_TIMEOUT_S,
+        force=args.force,
+        metrics=metrics,
     )
 
     parquet_creator = ParquetCreator(
@@ -68,15 +223,55 @@ if __name__ == "__main__":
         password,
         gt_finder,
         parquet_creator_logger,
+        submitter=RaasJobSubmitter(
+            username,
+            password,
+            parquet_creator_logger,
+            SUBMIT_JOB_URL,
+            max_workers=RAAS_MAX_WORKERS,
+            rate_per_s=RAAS_RATE_PER_S,
+            metrics=metrics,
+        ),
+        window_gap_tolerance_ns=RAAS_WINDOW_GAP_TOLERANCE_NS,
+        ledger=RaasJobLedger(GT_BASE_PATH),
+        metrics=metrics,
+    )
+
+    enabled_stages = set(args.stages)
+    main_logger.info(f"Enabled stages: {sorted(enabled_stages)}")
+    if "detect" in enabled_stages and not lane_change_detector_runner.build():
+        main_logger.error("Building the lane change detector failed, disabling detection")
+        enabled_stages.discard("detect")
+
+    missing_task_ids = set()
+    stages = build_per_task_stages(
+        enabled_stages, json_fetcher, lane_change_detector_runner, metrics, missing_task_ids
     )
+    if stages:
+        scheduler = PipelineScheduler(stages, main_logger, STAGE_QUEUE_SIZE)
+        scheduler.run(task_ids)
+        if "fetch" in enabled_stages:
+            json_fetcher.close()
+            json_fetcher.log_results()
+        # Tasks without a folder were never processed, so their status stays as it was
+        task_registry.set_status(scheduler.completed, STATUS_DONE)
+        task_registry.set_status(
+            [
+                task_id
+                for failed in scheduler.failures.values()
+                for task_id in failed
+                if task_id not in missing_task_ids
+            ],
+            STATUS_FAILED,
+        )
 
-    main_logger.info("Fetching GT JSON files")
-    #json_fetcher.run()
-    main_logger.info("Removing poses.json files")
-    remove_poses_json(GT_BASE_PATH)
-    main_logger.info("Running lane change detector")
-    lane_change_detector_runner.run()
-    # main_logger.info("Creating parquet files by triggering RAAS jobs")
-    # TODO: Add parquet_creator_copy inside the run method
-    # parquet_creator.run()
-    # main_logger.info("Ground truth pipeline completed")
+    main_logger.info("Indexing GT files")
+    gt_index.scan()
+    if "parquet" in enabled_stages:
+        main_logger.info("Creating parquet files by triggering RAAS jobs")
+        parquet_creator.run()
+    if "poll" in enabled_stages:
+        main_logger.info("Polling RAAS jobs")
+        parquet_creator.poll_jobs()
+    main_logger.info("Ground truth pipeline completed")
+    print(metrics.finish())
@@ -0,0 +1,18 @@
+import logging
+from scaleai_related_scripts.gt_index import GTIndex, INDEX_MAX_AGE_S
+from scaleai_related_scripts.lane_change_events import LaneChangeEventIndex
+
+
+if __name__ == "__main__":
+    # Set the directory you want to compact the lane change events of
+    directory = "/home/sc62291/stla/gt_to_explore_23_04_2025"
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+    gt_index = GTIndex(directory, logger)
+    gt_index.scan_if_stale(INDEX_MAX_AGE_S)
+    event_index = LaneChangeEventIndex(directory, logger, gt_index)
+    event_index.compact()
+
+    events = event_index.query()
+    print(f"Total lane change events: {len(events)}")
+    print(events.groupby("direction").size())
@@ -1,4 +1,6 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 from application.adp_fca.tools.eval.associations.object_association import ObjectAssociation
 from application.adp_fca.tools.eval.codecs.localization.scaleai_localization_adjustment_codec import (
@@ -12,59 +14,542 @@ from application.adp_fca.tools.eval.examples.examples_common import compute_pred
 from application.adp_fca.tools.eval.codecs.roads.scaleai_road_codec import ScaleAIRoadCodec
 from application.adp_fca.tools.eval.lane_change_detection.lane_change_detector import LaneChangeDetector
 import argparse
+import fcntl
+import fnmatch
+import functools
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
 
 pd.set_option("display.max_colwidth", None)
 
+# GT JSON files may be stored plain or compressed with gzip or zstd
+JSON_SUFFIXES = (".json", ".json.gz", ".json.zst")
+POSES_FILENAME = "poses.json"
+# Column of the reprocessed parquet that holds the prediction timestamp in nanoseconds
+PARQUET_TIMESTAMP_COLUMN = "timestamp"
+# Columns of the reprocessed parquet that PredictedObjectCodec reads; keep in sync with the
+# codec. A file lacking any of them is read with all its columns.
+PREDICTED_OBJECT_COLUMNS = [
+    "timestamp",
+    "ID_HF",
+    "x",
+    "y",
+    "vx",
+    "vy",
+    "length",
+    "width",
+    "heading",
+    "object_class",
+]
+# Decoded GT tables are cached here, keyed by the JSON content hash and the codec version
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "object_prediction_gt_example"
+DEFAULT_CACHE_MAX_GB = 20.0
+# Numeric columns of the KPI tables that are identifiers or times rather than KPIs; they are
+# left out of the percentiles unless --kpi-columns lists them
+NON_KPI_COLUMN_PATTERNS = ["*id", "*_id_*", "id_*", "*timestamp*", "*index*", "*frame*"]
+
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Object prediction ground truth example")
     parser.add_argument(
         "--json",
         type=str,
-        help="Path to the JSON file containing the ground truth data",
-        required=True,
+        nargs="+",
+        help="Path(s) to the JSON file(s) containing the ground truth data",
+        required=False,
+        default=[],
+    )
+    parser.add_argument(
+        "--json-dir",
+        type=str,
+        help="Directory that is searched recursively for ground truth JSON files",
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--json-list",
+        type=str,
+        help="Text file with one ground truth JSON path per line",
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--failed-list",
+        type=str,
+        help="Text file the paths of the JSON files that failed are written to, one per line",
+        required=False,
+        default=None,
     )
     parser.add_argument(
         "--parquet",
         type=str,
-        help="Path to the Parquet file containing the predicted objects",
+        help="Path to the Parquet file containing the predicted objects, only valid with a single JSON",
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--pairs",
+        type=str,
+        help="Csv with `json` and `parquet` columns; every GT JSON is evaluated against its reprocessed parquet",
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        help="Directory the per-session KPI tables and the summary of --pairs are written to",
+        required=False,
+        default="prediction_kpis",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of processes evaluating the pairs of --pairs",
+        required=False,
+        default=os.cpu_count(),
+    )
+    parser.add_argument(
+        "--kpi-columns",
+        type=str,
+        nargs="+",
+        help="KPI columns summarised over all pairs of --pairs; by default the numeric columns "
+        "that are not identifiers or timestamps",
         required=False,
         default=None,
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory of the decoded GT table cache",
+        required=False,
+        default=str(DEFAULT_CACHE_DIR),
+    )
+    parser.add_argument(
+        "--cache-max-gb",
+        type=float,
+        help="Size of the decoded GT table cache after which the least recently used entries are evicted",
+        required=False,
+        default=DEFAULT_CACHE_MAX_GB,
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Decode every GT JSON from scratch without reading or writing the cache",
+    )
+    parser.add_argument(
+        "--parquet-columns",
+        type=str,
+        nargs="+",
+        help="Parquet columns read for the predicted objects; by default PREDICTED_OBJECT_COLUMNS. "
+        "A file lacking any of them is read with all its columns",
+        required=False,
+        default=PREDICTED_OBJECT_COLUMNS,
+    )
+    parser.add_argument(
+        "--parquet-timestamp-column",
+        type=str,
+        help="Parquet column used to select the row groups that overlap the GT window",
+        required=False,
+        default=PARQUET_TIMESTAMP_COLUMN,
+    )
+    args = parser.parse_args()
+    if not (args.json or args.json_dir or args.json_list or args.pairs):
+        parser.error("one of --json, --json-dir, --json-list or --pairs is required")
+    return args
 
 
-def main() -> None:
-    args = parse_arguments()
-    json_file = args.json
-    output_dir: Path = Path(args.json).parent
-    parquet_file = args.parquet
+def has_top_level_metadata(json_file: Path) -> bool:
+    """Returns whether the JSON is an object with a top-level `metadata` key, like gt_index.classify_file.
 
-    json_data = EvalToolkit.read_json(json_file)
+    The file is scanned in chunks, tracking string and nesting state, and the scan stops as
+    soon as the key or the end of the top-level object is reached.
+    """
+    depth = 0
+    in_string = escaped = False
+    key, last_string = [], None
+    with open_json_text(json_file) as file:
+        for chunk in iter(lambda: file.read(64 * 1024), ""):
+            for char in chunk:
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == "\\":
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                        last_string = "".join(key) if depth == 1 else None
+                        continue
+                    if depth == 1:
+                        # Escapes are kept raw, so an escaped key never equals `metadata`
+                        key.append(char)
+                    continue
+                if char.isspace():
+                    continue
+                if depth == 0:
+                    if char != "{":
+                        return False
+                    depth = 1
+                elif char == '"':
+                    in_string = True
+                    key = []
+                    continue
+                elif char == ":" and depth == 1 and last_string == "metadata":
+                    return True
+                elif char in "{[":
+                    depth += 1
+                elif char in "}]":
+                    depth -= 1
+                    if depth == 0:
+                        return False
+                last_string = None
+    return False
 
-    # Extract data from JSON and Parquet using the desired data class
-    original_gt_data = EvalToolkit.extract(json_data, ScaleAIObjectCodec())
 
-    road_gt = EvalToolkit.extract(json_data, ScaleAIRoadCodec())
-    lanes = road_gt["lanes"]
-    lanes.to_csv("lane_gt_data.csv", index=False)
+def is_gt_file(json_file: Path) -> bool:
+    name = json_file.name
+    for suffix in JSON_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[: -len(suffix)] + ".json"
+            break
+    if name == POSES_FILENAME:
+        return False
+    try:
+        return has_top_level_metadata(json_file)
+    except (OSError, ValueError) as e:
+        print(f"Could not read {json_file}, skipping it: {e}")
+        return False
 
-    lane_change_detector = LaneChangeDetector()
-    lane_change_included_gt_data = lane_change_detector.extract(original_gt_data, lane_data=road_gt["lanes"])
 
-    csv_output_dir = output_dir / "lane_change_included_gt_data.csv"
-    print("Copy csv file in %s", csv_output_dir)
-    lane_change_included_gt_data.to_csv(csv_output_dir, index=False)
+def collect_json_files(args) -> List[Path]:
+    json_files = [Path(json_file) for json_file in args.json]
+    if args.json_dir:
+        # Only GT files: poses.json, fetch sidecars and other JSON files would fail in the codecs
+        json_files.extend(
+            sorted(
+                path
+                for suffix in JSON_SUFFIXES
+                for path in Path(args.json_dir).rglob(f"*{suffix}")
+                if is_gt_file(path)
+            )
+        )
+    if args.json_list:
+        with open(args.json_list, "r") as file:
+            json_files.extend(Path(line.strip()) for line in file if line.strip())
+    return json_files
+
+
+def open_json_text(json_file: Path):
+    """Opens a plain, `.json.gz` or `.json.zst` JSON file as UTF-8 text."""
+    name = Path(json_file).name
+    if name.endswith(".json.gz"):
+        return gzip.open(json_file, "rt", encoding="utf-8")
+    if name.endswith(".json.zst"):
+        import zstandard
+
+        return zstandard.open(json_file, "rt", encoding="utf-8")
+    return open(json_file, "r", encoding="utf-8")
+
+
+def read_json(json_file: Path):
+    """Reads a plain GT JSON with EvalToolkit, and decompresses a `.json.gz` or `.json.zst` one first."""
+    if Path(json_file).name.endswith(".json"):
+        return EvalToolkit.read_json(str(json_file))
+    with open_json_text(json_file) as file:
+        return json.load(file)
+
+
+def to_ns(value) -> int:
+    """Converts an integer or datetime timestamp from the parquet statistics or data to nanoseconds."""
+    return pd.Timestamp(value).value if not isinstance(value, (int, float)) else int(value)
+
+
+def read_parquet_window(
+    parquet_file: str,
+    start_timestamp: Optional[int],
+    end_timestamp: Optional[int],
+    columns: Optional[List[str]] = None,
+    timestamp_column: str = PARQUET_TIMESTAMP_COLUMN,
+) -> pd.DataFrame:
+    """Reads only `columns` of the row groups that overlap the GT window, one row group at a time.
+
+    The RAAS output is padded by 20 s before and 5 s after the GT window. Row groups whose
+    timestamp statistics lie outside the window are skipped without being read, and the
+    rows of the others are filtered to the window, so peak memory stays at about one row group.
+    """
+    parquet = pq.ParquetFile(parquet_file)
+    schema_names = parquet.schema_arrow.names
+    if columns is not None:
+        columns = list(dict.fromkeys([*columns, timestamp_column]))
+        missing_columns = [column for column in columns if column not in schema_names]
+        if missing_columns:
+            print(f"{parquet_file} has no columns {missing_columns}, reading all columns")
+            columns = None
+    # Row group statistics are indexed by Parquet leaf column, which nested columns shift
+    leaf_paths = [parquet.schema.column(index).path for index in range(len(parquet.schema))]
+    if timestamp_column not in leaf_paths or start_timestamp is None or end_timestamp is None:
+        print(f"No GT window or no {timestamp_column} column, reading all row groups of {parquet_file}")
+        return parquet.read(columns=columns).to_pandas()
+
+    start_timestamp, end_timestamp = int(start_timestamp), int(end_timestamp)
+    timestamp_index = leaf_paths.index(timestamp_column)
+    frames = []
+    skipped_row_groups = 0
+    for row_group in range(parquet.num_row_groups):
+        statistics = parquet.metadata.row_group(row_group).column(timestamp_index).statistics
+        if statistics is not None and statistics.has_min_max:
+            if to_ns(statistics.max) < start_timestamp or to_ns(statistics.min) > end_timestamp:
+                skipped_row_groups += 1
+                continue
+        frame = parquet.read_row_group(row_group, columns=columns).to_pandas()
+        timestamps = frame[timestamp_column]
+        if pd.api.types.is_datetime64_any_dtype(timestamps):
+            # Parquet keeps the unit it was written with, e.g. us, and the GT window is in ns
+            timestamps = timestamps.dt.as_unit("ns").astype("int64")
+        frames.append(frame[(timestamps >= start_timestamp) & (timestamps <= end_timestamp)])
+    print(
+        f"Read {parquet.num_row_groups - skipped_row_groups} of {parquet.num_row_groups} row groups "
+        f"of {parquet_file}"
+    )
+    if not frames:
+        return parquet.schema_arrow.empty_table().select(columns or schema_names).to_pandas()
+    return pd.concat(frames, ignore_index=True)
+
+
+def hash_file(file_path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def codec_version(codec_class: type) -> str:
+    """Identifies a codec by the hash of the source file of its class, so editing the codec invalidates its entries."""
+    digest = hashlib.sha256(codec_class.__qualname__.encode("utf-8"))
+    try:
+        with open(inspect.getsourcefile(codec_class), "rb") as file:
+            digest.update(file.read())
+    except (OSError, TypeError):
+        pass
+    return digest.hexdigest()[:16]
 
-    if parquet_file:
-        parquet_data = EvalToolkit.read_parquet(parquet_file)
-        predicted_objects = EvalToolkit.extract(parquet_data, PredictedObjectCodec())
 
-        localization_adjustment_codec = ScaleAILocalizationAdjustmentCodec()
-        ego_positions = EvalToolkit.extract(json_data, localization_adjustment_codec)
+class DecodedGTCache:
+    """On-disk cache of the tables decoded from GT JSON files.
 
-        transformations_to_the_ego_frames = get_transformation_matrices_from_ego_position(ego_positions)
+    Every JSON gets one entry directory named after its content hash. A DataFrame is stored
+    as parquet, a dict of DataFrames as one parquet per key, and anything JSON serialisable
+    as JSON, each file named after the table and the codec version. Reading an entry
+    refreshes its mtime, and `evict` removes the least recently used entries once the cache
+    exceeds `max_bytes`. Values that cannot be stored are simply decoded every time.
 
+    As one detector process runs per GT file, the cache size is tracked in cheap marker
+    files: `SIZE_FILENAME` holds the size measured by the last eviction, and every store
+    appends the bytes it wrote to `STORED_FILENAME`. `evict_if_full` only walks the cache
+    when the two add up to more than `max_bytes`, and one process evicts at a time.
+    """
+
+    SIZE_FILENAME = ".size"
+    STORED_FILENAME = ".stored"
+    LOCK_FILENAME = ".evict.lock"
+
+    def __init__(self, cache_dir, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def entry_dir(self, json_hash: str) -> Path:
+        return self.cache_dir / json_hash
+
+    def load(self, table_path: Path):
+        if table_path.is_dir():
+            return {
+                file_path.stem: pd.read_parquet(file_path)
+                for file_path in sorted(table_path.glob("*.parquet"))
+            }
+        if table_path.suffix == ".parquet":
+            return pd.read_parquet(table_path)
+        with open(table_path, "r") as file:
+            return json.load(file)
+
+    @staticmethod
+    def tmp_path(entry_dir: Path, table_name: str) -> Path:
+        return entry_dir / f".{table_name}.{os.getpid()}.tmp"
+
+    def store(self, entry_dir: Path, table_name: str, value):
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name and renamed, as several detector processes share the cache
+        tmp_path = self.tmp_path(entry_dir, table_name)
+        if isinstance(value, pd.DataFrame):
+            value.to_parquet(tmp_path)
+            table_path = entry_dir / f"{table_name}.parquet"
+        elif isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+            tmp_path.mkdir()
+            for key, frame in value.items():
+                frame.to_parquet(tmp_path / f"{key}.parquet")
+            table_path = entry_dir / f"{table_name}.tables"
+        else:
+            with open(tmp_path, "w") as file:
+                json.dump(value, file)
+            table_path = entry_dir / f"{table_name}.json"
+        if table_path.is_dir():
+            shutil.rmtree(table_path, ignore_errors=True)
+        os.replace(tmp_path, table_path)
+        self.record_stored_bytes(table_path)
+
+    def record_stored_bytes(self, table_path: Path):
+        if table_path.is_dir():
+            size = sum(f.stat().st_size for f in table_path.iterdir())
+        else:
+            size = table_path.stat().st_size
+        # A single short append is atomic, so concurrent processes do not mix their lines
+        with open(self.cache_dir / self.STORED_FILENAME, "a") as file:
+            file.write(f"{size}\n")
+
+    def estimated_size(self) -> int:
+        """Returns the cache size of the last eviction plus the bytes stored since then."""
+        try:
+            size = int((self.cache_dir / self.SIZE_FILENAME).read_text())
+        except (OSError, ValueError):
+            # Never measured yet: assume full, so the first eviction measures it
+            return self.max_bytes + 1
+        try:
+            with open(self.cache_dir / self.STORED_FILENAME, "r") as file:
+                size += sum(int(line) for line in file if line.strip().isdigit())
+        except OSError:
+            pass
+        return size
+
+    def evict_if_full(self):
+        """Evicts only if the size markers exceed `max_bytes` and no other process is evicting."""
+        if self.estimated_size() <= self.max_bytes:
+            return
+        with open(self.cache_dir / self.LOCK_FILENAME, "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            self.evict()
+
+    def get_or_decode(self, json_hash: str, table_name: str, decode: Callable[[], object]):
+        entry_dir = self.entry_dir(json_hash)
+        for suffix in (".parquet", ".tables", ".json"):
+            table_path = entry_dir / f"{table_name}{suffix}"
+            if not table_path.exists():
+                continue
+            try:
+                value = self.load(table_path)
+                os.utime(entry_dir)
+                return value
+            except Exception as e:
+                print(f"Ignoring unreadable cache entry {table_path}: {e}")
+                break
+
+        value = decode()
+        try:
+            self.store(entry_dir, table_name, value)
+        except Exception as e:
+            print(f"Could not cache {table_name} of {json_hash}: {e}")
+            tmp_path = self.tmp_path(entry_dir, table_name)
+            if tmp_path.is_dir():
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            elif tmp_path.exists():
+                tmp_path.unlink()
+        return value
+
+    def evict(self):
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            if not entry_dir.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in entry_dir.rglob("*") if f.is_file())
+            entries.append((entry_dir.stat().st_mtime, size, entry_dir))
+        total_size = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, entry_dir in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+            evicted += 1
+        # A store finishing during the walk may be left out of the markers; they only trigger the walk
+        (self.cache_dir / self.STORED_FILENAME).write_text("")
+        tmp_path = self.cache_dir / f"{self.SIZE_FILENAME}.{os.getpid()}.tmp"
+        tmp_path.write_text(str(total_size))
+        os.replace(tmp_path, self.cache_dir / self.SIZE_FILENAME)
+        if evicted:
+            print(f"Evicted {evicted} decoded GT cache entries, {total_size / 1e9:.2f} GB remain")
+
+
+class GTTables:
+    """Decodes the tables of one GT JSON, through the cache if one is given.
+
+    The JSON is read at most once, and only if a requested table is not cached.
+    """
+
+    def __init__(self, json_file: Path, cache: Optional[DecodedGTCache] = None):
+        self.json_file = json_file
+        self.cache = cache
+        self.json_hash = hash_file(json_file) if cache else None
+        self._json_data = None
+
+    def json_data(self):
+        if self._json_data is None:
+            self._json_data = read_json(self.json_file)
+        return self._json_data
+
+    def decode(self, table_name: str, codec):
+        if self.cache is None:
+            return EvalToolkit.extract(self.json_data(), codec)
+        return self.cache.get_or_decode(
+            self.json_hash,
+            f"{table_name}-{codec_version(type(codec))}",
+            lambda: EvalToolkit.extract(self.json_data(), codec),
+        )
+
+    def read_metadata(self) -> dict:
+        data = self.json_data()
+        return data.get("metadata", {}) if isinstance(data, dict) else {}
+
+    def metadata(self) -> dict:
+        if self.cache is None:
+            return self.read_metadata()
+        return self.cache.get_or_decode(self.json_hash, "metadata", self.read_metadata)
+
+
+def evaluate_predictions(
+    gt_tables: GTTables,
+    original_gt_data: pd.DataFrame,
+    parquet_file: str,
+    parquet_columns: Optional[List[str]] = PREDICTED_OBJECT_COLUMNS,
+    parquet_timestamp_column: str = PARQUET_TIMESTAMP_COLUMN,
+    verbose: bool = True,
+) -> pd.DataFrame:
+    """Associates the predicted objects of the parquet with the GT objects and returns the KPI table."""
+    predicted_object_codec = PredictedObjectCodec()
+    metadata = gt_tables.metadata()
+    parquet_data = read_parquet_window(
+        parquet_file,
+        metadata.get("start_timestamp"),
+        metadata.get("end_timestamp"),
+        columns=parquet_columns,
+        timestamp_column=parquet_timestamp_column,
+    )
+    predicted_objects = EvalToolkit.extract(parquet_data, predicted_object_codec)
+
+    localization_adjustment_codec = ScaleAILocalizationAdjustmentCodec()
+    ego_positions = gt_tables.decode("ego_positions", localization_adjustment_codec)
+
+    transformations_to_the_ego_frames = get_transformation_matrices_from_ego_position(ego_positions)
+
+    if verbose:
         print("Ground Truth Data")
         print(original_gt_data.head(10))
         print("Predicted Objects")
@@ -72,17 +557,50 @@ def main() -> None:
         print("Transformation matrices")
         print(transformations_to_the_ego_frames)
 
-        object_associations = ObjectAssociation.associate_objects(original_gt_data, predicted_objects)
+    object_associations = ObjectAssociation.associate_objects(original_gt_data, predicted_objects)
+    if verbose:
         print("Object Associations")
         print(object_associations)
 
         print(object_associations["ID_HF"].values)
 
-        results = compute_prediction_metrics(
-            object_associations,
-            original_gt_data,
-            predicted_objects,
-            transformations_to_the_ego_frames,
+    return compute_prediction_metrics(
+        object_associations,
+        original_gt_data,
+        predicted_objects,
+        transformations_to_the_ego_frames,
+    )
+
+
+def process_json(
+    json_file: Path,
+    object_codec: ScaleAIObjectCodec,
+    road_codec: ScaleAIRoadCodec,
+    lane_change_detector: LaneChangeDetector,
+    parquet_file: str = None,
+    parquet_columns: Optional[List[str]] = PREDICTED_OBJECT_COLUMNS,
+    parquet_timestamp_column: str = PARQUET_TIMESTAMP_COLUMN,
+    cache: Optional[DecodedGTCache] = None,
+) -> None:
+    output_dir: Path = Path(json_file).parent
+    gt_tables = GTTables(json_file, cache)
+
+    # Extract data from JSON and Parquet using the desired data class
+    original_gt_data = gt_tables.decode("objects", object_codec)
+
+    road_gt = gt_tables.decode("road", road_codec)
+    lanes = road_gt["lanes"]
+    lanes.to_csv("lane_gt_data.csv", index=False)
+
+    lane_change_included_gt_data = lane_change_detector.extract(original_gt_data, lane_data=road_gt["lanes"])
+
+    csv_output_dir = output_dir / "lane_change_included_gt_data.csv"
+    print("Copy csv file in %s", csv_output_dir)
+    lane_change_included_gt_data.to_csv(csv_output_dir, index=False)
+
+    if parquet_file:
+        results = evaluate_predictions(
+            gt_tables, original_gt_data, parquet_file, parquet_columns, parquet_timestamp_column
         )
         print("Results with error:")
         print(results[results["kpi_error_status"].eq(True)])
@@ -90,5 +608,211 @@ def main() -> None:
         print(results)
 
 
+def read_pairs(pairs_file: str) -> List[Tuple[str, str]]:
+    """Reads the (GT JSON, reprocessed parquet) pairs from a csv with `json` and `parquet` columns."""
+    pairs = pd.read_csv(pairs_file, dtype=str)
+    return list(zip(pairs["json"], pairs["parquet"]))
+
+
+# State of an evaluation worker process, created once per process by `init_evaluation_worker`
+_evaluation_worker = {}
+
+
+def init_evaluation_worker(
+    output_dir: str,
+    cache_dir: Optional[str],
+    cache_max_bytes: int,
+    parquet_columns: Optional[List[str]],
+    parquet_timestamp_column: str,
+):
+    _evaluation_worker.update(
+        output_dir=Path(output_dir),
+        object_codec=ScaleAIObjectCodec(),
+        cache=DecodedGTCache(cache_dir, cache_max_bytes) if cache_dir else None,
+        parquet_columns=parquet_columns,
+        parquet_timestamp_column=parquet_timestamp_column,
+    )
+
+
+def evaluate_pair(pair: Tuple[str, str]) -> dict:
+    """Evaluates one pair in a worker process and writes its KPI table; errors are returned, not raised."""
+    json_file, parquet_file = pair
+    outcome = {"json": json_file, "parquet": parquet_file, "kpi_table": None, "rows": 0, "error": None}
+    try:
+        gt_tables = GTTables(Path(json_file), _evaluation_worker["cache"])
+        original_gt_data = gt_tables.decode("objects", _evaluation_worker["object_codec"])
+        results = evaluate_predictions(
+            gt_tables,
+            original_gt_data,
+            parquet_file,
+            _evaluation_worker["parquet_columns"],
+            _evaluation_worker["parquet_timestamp_column"],
+            verbose=False,
+        )
+        metadata = gt_tables.metadata()
+        session_id = metadata.get("session_id") or Path(json_file).parent.name
+        results.insert(0, "session_id", session_id)
+        results.insert(1, "json_file", json_file)
+        # One session can have several GT windows, so the start timestamp is part of the name
+        kpi_table = _evaluation_worker["output_dir"] / f"{session_id}_{metadata.get('start_timestamp', 0)}.parquet"
+        results.to_parquet(kpi_table, index=False)
+        outcome.update(kpi_table=str(kpi_table), rows=len(results), session_id=session_id)
+    except Exception as e:
+        outcome["error"] = f"{type(e).__name__}: {e}"
+    return outcome
+
+
+def is_kpi_column(field: pa.Field) -> bool:
+    name = field.name.lower()
+    return (pa.types.is_integer(field.type) or pa.types.is_floating(field.type)) and not any(
+        fnmatch.fnmatch(name, pattern) for pattern in NON_KPI_COLUMN_PATTERNS
+    )
+
+
+def summarize_kpi_tables(kpi_tables: List[str], kpi_columns: Optional[List[str]] = None) -> dict:
+    """Aggregates the KPI tables of all sessions in one vectorised pass over their KPI columns.
+
+    Only columns present in every table are read, so a table lacking one does not fail the summary.
+    """
+    schemas = [pq.read_schema(kpi_table) for kpi_table in kpi_tables]
+    common_names = set.intersection(*(set(schema.names) for schema in schemas))
+    if kpi_columns is None:
+        kpi_columns = [field.name for field in schemas[0] if is_kpi_column(field)]
+    missing_columns = [column for column in kpi_columns if column not in common_names]
+    if missing_columns:
+        print(f"KPI columns missing from some tables, not summarised: {missing_columns}")
+    columns = ["session_id", "kpi_error_status"] + [
+        column for column in kpi_columns if column in common_names
+    ]
+    results = pd.concat(
+        (pd.read_parquet(kpi_table, columns=columns) for kpi_table in kpi_tables), ignore_index=True
+    )
+    is_error = results["kpi_error_status"].eq(True)
+    per_session = (
+        is_error.groupby(results["session_id"]).agg(rows="size", kpi_errors="sum").reset_index()
+    )
+    per_session["error_rate"] = per_session["kpi_errors"] / per_session["rows"]
+    numeric = results.drop(columns=["session_id", "kpi_error_status"])
+    percentiles = numeric.quantile([0.5, 0.9, 0.95, 0.99]).T
+    percentiles.columns = ["p50", "p90", "p95", "p99"]
+    percentiles.insert(0, "mean", numeric.mean())
+    return {
+        "per_session": per_session,
+        "percentiles": percentiles,
+        "totals": {
+            "sessions": int(per_session["session_id"].nunique()),
+            "rows": int(len(results)),
+            "kpi_errors": int(is_error.sum()),
+            "error_rate": float(is_error.mean()) if len(results) else 0.0,
+            "kpi_error_status_counts": {
+                str(status): int(count)
+                for status, count in results["kpi_error_status"].value_counts(dropna=False).items()
+            },
+        },
+    }
+
+
+def evaluate_dataset(args) -> bool:
+    """Evaluates all pairs of `--pairs` over a process pool and writes the KPI tables and the summary.
+
+    Returns False if any pair failed.
+    """
+    pairs = read_pairs(args.pairs)
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = None if args.no_cache else args.cache_dir
+    print(f"Evaluating {len(pairs)} GT/parquet pairs with {args.workers} workers")
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=init_evaluation_worker,
+        initargs=(
+            str(output_dir),
+            cache_dir,
+            int(args.cache_max_gb * 1e9),
+            args.parquet_columns,
+            args.parquet_timestamp_column,
+        ),
+    ) as executor:
+        outcomes = list(executor.map(evaluate_pair, pairs))
+    if cache_dir:
+        DecodedGTCache(cache_dir, int(args.cache_max_gb * 1e9)).evict_if_full()
+
+    failed = [outcome for outcome in outcomes if outcome["error"]]
+    for outcome in failed:
+        print(f"Error evaluating {outcome['json']} with {outcome['parquet']}: {outcome['error']}")
+    kpi_tables = [outcome["kpi_table"] for outcome in outcomes if outcome["kpi_table"]]
+
+    summary = {"totals": {}, "failed_pairs": failed}
+    if kpi_tables:
+        try:
+            aggregated = summarize_kpi_tables(kpi_tables, args.kpi_columns)
+        except Exception as e:
+            # The KPI tables stay on disk, so only the summary has to be redone
+            print(f"Error summarizing the KPI tables: {e}")
+            summary["summary_error"] = f"{type(e).__name__}: {e}"
+        else:
+            aggregated["per_session"].to_csv(output_dir / "summary_per_session.csv", index=False)
+            aggregated["percentiles"].to_csv(output_dir / "summary_percentiles.csv")
+            summary["totals"] = aggregated["totals"]
+            print("KPI percentiles:")
+            print(aggregated["percentiles"])
+    summary["totals"]["evaluated_pairs"] = len(kpi_tables)
+    summary["totals"]["failed_pairs"] = len(failed)
+    with open(output_dir / "summary.json", "w") as file:
+        json.dump(summary, file, indent=2)
+    print(json.dumps(summary["totals"], indent=2))
+    print(f"KPI tables and summary written to {output_dir}")
+    return not failed and "summary_error" not in summary
+
+
+def main() -> None:
+    args = parse_arguments()
+    if args.pairs:
+        if not evaluate_dataset(args):
+            raise SystemExit(1)
+        return
+
+    json_files = collect_json_files(args)
+    if args.parquet and len(json_files) != 1:
+        raise ValueError("--parquet can only be used together with a single JSON file")
+
+    # The codecs and the detector are created once and reused for every JSON
+    object_codec = ScaleAIObjectCodec()
+    road_codec = ScaleAIRoadCodec()
+    lane_change_detector = LaneChangeDetector()
+    cache = None if args.no_cache else DecodedGTCache(args.cache_dir, int(args.cache_max_gb * 1e9))
+
+    failed_json_files = []
+    for json_file in json_files:
+        print(f"Processing {json_file}")
+        try:
+            process_json(
+                json_file,
+                object_codec,
+                road_codec,
+                lane_change_detector,
+                args.parquet,
+                args.parquet_columns,
+                args.parquet_timestamp_column,
+                cache,
+            )
+        except Exception as e:
+            print(f"Error processing {json_file}: {e}")
+            failed_json_files.append(json_file)
+
+    if cache:
+        cache.evict_if_full()
+    if args.failed_list:
+        # Written even when empty, so the caller can tell a finished run from a crashed one
+        with open(args.failed_list, "w") as file:
+            file.writelines(f"{json_file}\n" for json_file in failed_json_files)
+    if failed_json_files:
+        print(f"Failed to process {len(failed_json_files)} of {len(json_files)} JSON files:")
+        for json_file in failed_json_files:
+            print(json_file)
+        raise SystemExit(1)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,92 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .gt_storage import FETCH_MANIFEST_FILENAME
+
+
+def hash_folder(folder: Path) -> Tuple[str, int]:
+    """Returns the sha256 of all files in `folder` (relative paths included) and their total size."""
+    digest = hashlib.sha256()
+    total_size = 0
+    for file_path in sorted(p for p in Path(folder).rglob("*") if p.is_file()):
+        digest.update(str(file_path.relative_to(folder)).encode("utf-8"))
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+                total_size += len(chunk)
+    return digest.hexdigest(), total_size
+
+
+class FetchManifest:
+    """Persistent record of the fetched Scale tasks stored under the GT base path.
+
+    Each task id maps to the content hash and size of its folder, the fetch time and
+    the last fetch result, so a re-run only fetches new or failed tasks and only
+    rewrites the folders whose content changed.
+    """
+
+    def __init__(self, base_path: str, logger: logging.Logger):
+        self.manifest_path = Path(base_path) / FETCH_MANIFEST_FILENAME
+        self.logger = logger
+        self.entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.manifest_path.exists():
+            return
+        try:
+            with open(self.manifest_path, "r") as file:
+                self.entries = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.error(f"Could not read manifest {self.manifest_path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with self._lock:
+            with open(tmp_path, "w") as file:
+                json.dump(self.entries, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+
+    def get(self, task_id: str) -> Optional[dict]:
+        return self.entries.get(task_id)
+
+    def is_up_to_date(self, task_id: str, destination_path: Path) -> bool:
+        entry = self.get(task_id)
+        return (
+            entry is not None
+            and entry["result"] == "SUCCESS"
+            and (Path(destination_path) / task_id).is_dir()
+        )
+
+    def has_changed(self, task_id: str, content_hash: str) -> bool:
+        entry = self.get(task_id)
+        return entry is None or entry.get("content_hash") != content_hash
+
+    def record(
+        self,
+        task_id: str,
+        result: str,
+        content_hash: Optional[str] = None,
+        size: Optional[int] = None,
+        skipped_files: Optional[List[str]] = None,
+    ):
+        """Records a fetch; `skipped_files` are the files of the task left out by the copy filters."""
+        with self._lock:
+            entry = self.entries.setdefault(task_id, {})
+            entry["result"] = result
+            entry["fetched_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+            if content_hash is not None:
+                entry["content_hash"] = content_hash
+                entry["size"] = size
+            if skipped_files is not None:
+                entry["skipped_files"] = skipped_files
+        self.save()
@@ -0,0 +1,52 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from .gt_storage import COMPRESSION_ZSTD, compress_gt_file, compression_of, find_json_files
+from .pipeline_metrics import PipelineMetrics, measure
+
+
+def find_plain_json_files(base_path) -> List[Path]:
+    return [path for path in find_json_files(base_path) if compression_of(path) is None]
+
+
+def compress_json_files(
+    file_paths: Iterable[Path],
+    compression: str = COMPRESSION_ZSTD,
+    level: Optional[int] = None,
+    max_workers: int = 8,
+) -> List[Tuple[Path, int, int]]:
+    """Compresses the files from a thread pool and returns (compressed path, size before, size after).
+
+    Both compressors release the GIL, so the threads compress in parallel.
+    """
+
+    def compress(file_path: Path) -> Tuple[Path, int, int]:
+        size_before = file_path.stat().st_size
+        compressed_path = compress_gt_file(file_path, compression, level)
+        return compressed_path, size_before, compressed_path.stat().st_size
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(compress, file_paths))
+
+
+def compress_gt_folder(
+    folder,
+    compression: str = COMPRESSION_ZSTD,
+    level: Optional[int] = None,
+    metrics: Optional[PipelineMetrics] = None,
+) -> List[Path]:
+    """Replaces every plain JSON file of a task folder by its compressed copy."""
+    folder = Path(folder)
+    with measure(metrics, "compress", folder.name) as record:
+        results = compress_json_files(
+            find_plain_json_files(folder), compression, level, max_workers=1
+        )
+        record["bytes_read"] = sum(size_before for _, size_before, _ in results)
+        record["bytes_written"] = sum(size_after for _, _, size_after in results)
+    logging.info(
+        f"Compressed {len(results)} JSON files in {folder} "
+        f"from {record['bytes_read']} to {record['bytes_written']} bytes"
+    )
+    return [compressed_path for compressed_path, _, _ in results]
@@ -0,0 +1,260 @@
+import io
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from .gt_metadata import TopLevelKeyReader, read_gt_metadata
+from .gt_storage import GT_INDEX_FILENAME, is_json_file, open_gt_file, uncompressed_name
+
+# Reuse a GT index younger than this many seconds instead of rescanning it. None always runs
+# the incremental scan, which is cheap on an unchanged tree and never misses recent files.
+INDEX_MAX_AGE_S = None
+
+KIND_GT = "gt"
+KIND_POSES = "poses"
+KIND_LANE_CHANGE_CSV = "lane_change_csv"
+KIND_OTHER_JSON = "other_json"
+KIND_OTHER = "other"
+
+POSES_FILENAME = "poses.json"
+LANE_CHANGE_CSV_FILENAME = "lane_change_included_gt_data.csv"
+
+# Number of bytes read from the start of a JSON file to decide whether it is a GT file
+PEEK_BYTES = 64 * 1024
+
+
+def to_int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_file(file_path: Path) -> Tuple[str, Optional[dict]]:
+    """Returns the kind of a file from its name and, for plain or compressed JSON files, their first bytes.
+
+    A JSON file is a GT file if its top level is an object with a `metadata` object. The
+    top-level keys are read from the first PEEK_BYTES; the file is only read further when
+    the head ends before the key or the end of the object is reached. Returns (kind,
+    metadata), where metadata is the parsed `metadata` object of a GT file and None
+    otherwise, so callers need not read the file again.
+    """
+    file_path = Path(file_path)
+    name = uncompressed_name(file_path)
+    if name == LANE_CHANGE_CSV_FILENAME:
+        return KIND_LANE_CHANGE_CSV, None
+    if name == POSES_FILENAME:
+        return KIND_POSES, None
+    if not is_json_file(file_path):
+        return KIND_OTHER, None
+
+    # Only the first PEEK_BYTES of a compressed file are decompressed. Decompressing
+    # readers may return short reads, so read until the head is full or the file ends.
+    head = b""
+    with open_gt_file(file_path, "rb") as file:
+        while len(head) < PEEK_BYTES:
+            chunk = file.read(PEEK_BYTES - len(head))
+            if not chunk:
+                break
+            head += chunk
+    stripped_head = head.lstrip()
+    if not stripped_head.startswith(b"{"):
+        return KIND_OTHER_JSON, None
+    # Only a top-level `metadata` key counts, not one nested in e.g. a list of frames
+    text = head.decode("utf-8", errors="ignore")
+    try:
+        found, metadata = TopLevelKeyReader(io.StringIO(text)).read("metadata")
+        if found and isinstance(metadata, dict):
+            return KIND_GT, metadata
+        return KIND_OTHER_JSON, None
+    except ValueError:
+        # Either the head ends before the key was found, or the file is not valid JSON
+        if len(head) < PEEK_BYTES:
+            return KIND_OTHER_JSON, None
+    try:
+        metadata = read_gt_metadata(file_path)
+    except ValueError:
+        return KIND_OTHER_JSON, None
+    return (KIND_GT, metadata) if metadata is not None else (KIND_OTHER_JSON, None)
+
+
+class GTIndex:
+    """SQLite index of the files under a GT base path.
+
+    A scan walks the tree once and records path, kind, size, mtime, task id, session id
+    and start/end timestamps of every file. Later scans only re-read files whose size or
+    mtime changed and drop the files that disappeared, so every pipeline stage can query
+    the index instead of walking the tree again.
+    """
+
+    def __init__(
+        self,
+        base_path: str,
+        logger: logging.Logger,
+        index_path: Optional[str] = None,
+    ):
+        self.base_path = Path(base_path)
+        self.logger = logger
+        self.index_path = Path(index_path) if index_path else self.base_path / GT_INDEX_FILENAME
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.index_path))
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                task_id TEXT,
+                session_id TEXT,
+                start_timestamp INTEGER,
+                end_timestamp INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS files_kind ON files (kind);
+            CREATE INDEX IF NOT EXISTS files_session_id ON files (session_id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+
+    def close(self):
+        self.connection.close()
+
+    def classify(self, file_path: Path) -> dict:
+        """Returns the kind and, for GT files, the metadata columns of a file."""
+        row = {
+            "kind": KIND_OTHER,
+            "session_id": None,
+            "start_timestamp": None,
+            "end_timestamp": None,
+        }
+        try:
+            row["kind"], metadata = classify_file(file_path)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Error reading {file_path}: {e}")
+            row["kind"] = KIND_OTHER_JSON if is_json_file(file_path) else KIND_OTHER
+            metadata = None
+        if metadata:
+            row["session_id"] = metadata.get("session_id")
+            row["start_timestamp"] = to_int_or_none(metadata.get("start_timestamp"))
+            row["end_timestamp"] = to_int_or_none(metadata.get("end_timestamp"))
+        return row
+
+    def walk(self) -> Iterable[os.DirEntry]:
+        stack = [str(self.base_path)]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and not entry.name.startswith(GT_INDEX_FILENAME):
+                        yield entry
+
+    def scan(self, max_workers: int = 8):
+        """Walks the base path once and updates the index incrementally.
+
+        Changed files are classified from `max_workers` threads, as reading them is I/O bound.
+        """
+        if not self.base_path.is_dir():
+            self.logger.error(f"The provided path {self.base_path} is not a directory.")
+            return
+
+        self.logger.info(f"Indexing GT files in {self.base_path}")
+        known = {
+            row["path"]: (row["size"], row["mtime_ns"])
+            for row in self.connection.execute("SELECT path, size, mtime_ns FROM files")
+        }
+        seen = set()
+        changed = []
+        for entry in self.walk():
+            stat = entry.stat()
+            seen.add(entry.path)
+            if known.get(entry.path) != (stat.st_size, stat.st_mtime_ns):
+                changed.append((Path(entry.path), stat))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            classified = list(executor.map(self.classify, [path for path, _ in changed]))
+
+        with self.connection:
+            for (file_path, stat), row in zip(changed, classified):
+                relative_parts = file_path.relative_to(self.base_path).parts
+                task_id = relative_parts[0] if len(relative_parts) > 1 else None
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        str(file_path),
+                        row["kind"],
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                        task_id,
+                        row["session_id"],
+                        row["start_timestamp"],
+                        row["end_timestamp"],
+                    ),
+                )
+            removed = [path for path in known if path not in seen]
+            self.connection.executemany(
+                "DELETE FROM files WHERE path = ?", [(path,) for path in removed]
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('last_scan', ?)", (str(time.time()),)
+            )
+        self.logger.info(
+            f"Indexed {len(seen)} files: {len(changed)} updated, {len(removed)} removed"
+        )
+
+    def last_scan_time(self) -> Optional[float]:
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'last_scan'"
+        ).fetchone()
+        return float(row["value"]) if row else None
+
+    def scan_if_stale(self, max_age_s: Optional[float] = INDEX_MAX_AGE_S):
+        """Scans only if the index was never scanned or its last scan is older than `max_age_s`.
+
+        With `max_age_s` None, the incremental scan always runs; it only re-reads changed
+        files, so it is cheap on an unchanged tree, and the index is never out of date.
+        """
+        last_scan = self.last_scan_time()
+        if max_age_s is None or last_scan is None or time.time() - last_scan > max_age_s:
+            self.scan()
+        else:
+            self.logger.info(f"Using GT index {self.index_path} from its last scan")
+
+    def rows(
+        self,
+        kind: Optional[str] = None,
+        suffix: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> List[sqlite3.Row]:
+        query = "SELECT * FROM files WHERE 1 = 1"
+        params = []
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        if suffix is not None:
+            query += " AND path LIKE ?"
+            params.append(f"%{suffix}")
+        if session_id is not None:
+            query += " AND session_id = ?"
+            params.append(session_id)
+        return self.connection.execute(query + " ORDER BY path", params).fetchall()
+
+    def paths(self, **filters) -> List[Path]:
+        return [Path(row["path"]) for row in self.rows(**filters)]
+
+    def session_ids(self) -> set:
+        return {
+            row["session_id"]
+            for row in self.connection.execute(
+                "SELECT DISTINCT session_id FROM files WHERE kind = ? AND session_id IS NOT NULL",
+                (KIND_GT,),
+            )
+        }
+
+    def remove(self, file_path):
+        with self.connection:
+            self.connection.execute("DELETE FROM files WHERE path = ?", (str(file_path),))
@@ -0,0 +1,146 @@
+import json
+from pathlib import Path
+from typing import Optional, TextIO
+
+from .gt_storage import open_gt_file, read_gt_json
+
+# Size of the chunks the streaming reader reads from a GT file
+CHUNK_CHARS = 16 * 1024
+# The streaming reader gives up and parses the whole file once it read this many characters
+MAX_STREAM_CHARS = 1024 * 1024
+
+WHITESPACE = " \t\r\n"
+
+
+class StreamBudgetExceeded(Exception):
+    pass
+
+
+class TopLevelKeyReader:
+    """Reads the value of one top-level key of a JSON object without parsing the rest.
+
+    The file is consumed in chunks. The values of the other keys are skipped by tracking
+    string and nesting state, so memory stays constant, and reading stops as soon as the
+    requested value has been decoded.
+    """
+
+    def __init__(self, file: TextIO, max_chars: int = MAX_STREAM_CHARS):
+        self.file = file
+        self.max_chars = max_chars
+        self.chars_read = 0
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        if self.chars_read >= self.max_chars:
+            raise StreamBudgetExceeded()
+        chunk = self.file.read(CHUNK_CHARS)
+        if not chunk:
+            return False
+        self.chars_read += len(chunk)
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def decode(self):
+        """Decodes a string or object value, reading more chunks while it is incomplete."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            self.pos = end
+            return value
+
+    def skip_value(self):
+        self.peek()
+        depth = 0
+        in_string = False
+        escaped = False
+        while True:
+            while self.pos < len(self.buffer):
+                char = self.buffer[self.pos]
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == "\\":
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                        if depth == 0:
+                            self.pos += 1
+                            return
+                elif char == '"':
+                    in_string = True
+                elif char in "{[":
+                    depth += 1
+                elif char in "}]":
+                    if depth == 0:
+                        # end of the enclosing object after a scalar value
+                        return
+                    depth -= 1
+                    if depth == 0:
+                        self.pos += 1
+                        return
+                elif char == "," and depth == 0:
+                    return
+                self.pos += 1
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON")
+
+    def read(self, key: str):
+        """Returns (True, value) if the top-level object has `key`, (False, None) otherwise."""
+        if self.peek() != "{":
+            return False, None
+        self.pos += 1
+        if self.peek() == "}":
+            return False, None
+        while True:
+            current_key = self.decode()
+            self.expect(":")
+            if current_key == key:
+                return True, self.decode()
+            self.skip_value()
+            if self.peek() == "}":
+                return False, None
+            self.expect(",")
+
+
+def read_gt_metadata(file_path: Path) -> Optional[dict]:
+    """Returns the `metadata` object of a plain or compressed GT JSON, or None if the file has none.
+
+    Only the start of the file is read when `metadata` is near the beginning; the file is
+    parsed in full only if the key was not found within MAX_STREAM_CHARS.
+    """
+    with open_gt_file(file_path, "rt") as file:
+        try:
+            found, metadata = TopLevelKeyReader(file).read("metadata")
+        except (StreamBudgetExceeded, ValueError):
+            found = None
+    if found is None:
+        # Reopened rather than rewound, as compressed streams cannot seek backwards cheaply
+        data = read_gt_json(file_path)
+        found = isinstance(data, dict) and "metadata" in data
+        metadata = data["metadata"] if found else None
+    if found and isinstance(metadata, dict):
+        return metadata
+    return None
@@ -0,0 +1,114 @@
+import gzip
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import IO, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    # Only needed to read or write `.json.zst` files
+    zstandard = None
+
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSION_SUFFIXES = {COMPRESSION_GZIP: ".gz", COMPRESSION_ZSTD: ".zst"}
+# GT JSON files may be stored plain or compressed; the suffix decides how they are read
+JSON_SUFFIXES = (".json", ".json.gz", ".json.zst")
+DEFAULT_LEVELS = {COMPRESSION_GZIP: 6, COMPRESSION_ZSTD: 10}
+
+# State the pipeline keeps next to the GT files. None of these names ends with `.json`, so
+# `is_json_file` never mistakes one of them for a GT file when a GT base path is searched.
+FETCH_MANIFEST_FILENAME = ".fetch_manifest"
+GT_INDEX_FILENAME = ".gt_index.sqlite"
+RAAS_LEDGER_FILENAME = ".raas_jobs.sqlite"
+LANE_CHANGE_STATS_CACHE_FILENAME = ".lane_change_stats_cache"
+TASK_STATUS_FILENAME = ".task_status"
+
+
+def require_zstandard():
+    if zstandard is None:
+        raise ImportError(
+            "Reading or writing .zst GT files needs the zstandard package: pip install zstandard"
+        )
+
+
+def compression_of(file_path) -> Optional[str]:
+    name = Path(file_path).name
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if name.endswith(suffix):
+            return compression
+    return None
+
+
+def uncompressed_name(file_path) -> str:
+    """Returns the file name without a compression suffix, e.g. `poses.json` for `poses.json.zst`."""
+    name = Path(file_path).name
+    compression = compression_of(file_path)
+    return name[: -len(COMPRESSION_SUFFIXES[compression])] if compression else name
+
+
+def is_json_file(file_path) -> bool:
+    return Path(file_path).name.endswith(JSON_SUFFIXES)
+
+
+def find_json_files(base_path, recursive: bool = True) -> List[Path]:
+    """Returns the plain and compressed JSON files under `base_path`."""
+    base_dir = Path(base_path)
+    glob = base_dir.rglob if recursive else base_dir.glob
+    return sorted(path for suffix in JSON_SUFFIXES for path in glob(f"*{suffix}"))
+
+
+def open_gt_file(file_path, mode: str = "rt") -> IO:
+    """Opens a plain, gzip or zstd compressed file, decompressing transparently.
+
+    `mode` is "rt" or "rb"; text is always decoded as UTF-8.
+    """
+    compression = compression_of(file_path)
+    encoding = "utf-8" if "t" in mode else None
+    if compression == COMPRESSION_GZIP:
+        return gzip.open(file_path, mode, encoding=encoding)
+    if compression == COMPRESSION_ZSTD:
+        require_zstandard()
+        return zstandard.open(file_path, mode, encoding=encoding)
+    return open(file_path, mode, encoding=encoding)
+
+
+def read_gt_json(file_path):
+    with open_gt_file(file_path, "rt") as file:
+        return json.load(file)
+
+
+def compress_gt_file(
+    file_path,
+    compression: str = COMPRESSION_ZSTD,
+    level: Optional[int] = None,
+    remove_original: bool = True,
+) -> Path:
+    """Writes a compressed copy of a plain JSON file next to it and returns its path.
+
+    The copy is written to a temporary file and renamed, so readers never see a partial
+    file, and it gets the mtime of the original.
+    """
+    file_path = Path(file_path)
+    if compression_of(file_path):
+        return file_path
+    level = DEFAULT_LEVELS[compression] if level is None else level
+    compressed_path = file_path.with_name(file_path.name + COMPRESSION_SUFFIXES[compression])
+    tmp_path = compressed_path.with_name(compressed_path.name + ".tmp")
+    with open(file_path, "rb") as source:
+        if compression == COMPRESSION_GZIP:
+            with gzip.open(tmp_path, "wb", compresslevel=level) as destination:
+                shutil.copyfileobj(source, destination, 1024 * 1024)
+        else:
+            require_zstandard()
+            with open(tmp_path, "wb") as destination:
+                zstandard.ZstdCompressor(level=level).copy_stream(source, destination)
+    stat = file_path.stat()
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(tmp_path, compressed_path)
+    if remove_original:
+        file_path.unlink()
+    return compressed_path
+
@@ -1,11 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from enum import Enum
+import fnmatch
 import subprocess
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 import datetime
+import os
 from pathlib import Path
 import shutil
 import logging
+import threading
+import time
 from tqdm import tqdm
+from .fetch_manifest import FetchManifest, hash_folder
+from .pipeline_metrics import PipelineMetrics, add_to_current_span, folder_size, measure
+from .scale_fetch_workers import FetchWorkerUnavailable, ScaleFetchWorkerPool
 
 
 class JsonFetcher:
@@ -13,15 +21,54 @@ class JsonFetcher:
         SUCCESS = 0
         FAILURE = 1
 
+    class TransferMode(Enum):
+        """How a fetched task folder is brought from the Scale script dir to the destination."""
+
+        COPY = "copy"
+        MOVE = "move"
+        HARDLINK = "hardlink"
+
+    class FetchBackend(Enum):
+        """How the Scale fetch script is run for a task."""
+
+        # A new Python interpreter per task
+        SUBPROCESS = "subprocess"
+        # Long-lived worker processes that load the fetch script once
+        WORKERS = "workers"
+
     def __init__(
         self,
         scaleai_script_path: str,
         list_of_task_ids: List[str],
         logger: logging.Logger,
         destination_path: str = None,
+        max_workers: int = 4,
+        fetch_timeout_s: Optional[float] = None,
+        manifest: Optional[FetchManifest] = None,
+        force_refresh: bool = False,
+        transfer_mode: "JsonFetcher.TransferMode" = TransferMode.COPY,
+        metrics: Optional[PipelineMetrics] = None,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        fetch_backend: "JsonFetcher.FetchBackend" = FetchBackend.SUBPROCESS,
     ):
         self.scaleai_script_path = scaleai_script_path
         self.list_of_task_ids = list_of_task_ids
+        self.max_workers = max_workers
+        self.fetch_timeout_s = fetch_timeout_s
+        self.manifest = manifest
+        self.force_refresh = force_refresh
+        self.transfer_mode = transfer_mode
+        self.metrics = metrics
+        # Glob patterns matched against the file name and the path relative to the task folder
+        self.include_patterns = include_patterns
+        self.exclude_patterns = exclude_patterns or []
+        # Maps every copied task id to the files the patterns kept out of the destination
+        self.skipped_files: Dict[str, List[str]] = {}
+        self.fetch_backend = fetch_backend
+        # Started on the first fetch with the WORKERS backend
+        self.worker_pool: Optional[ScaleFetchWorkerPool] = None
+        self._worker_pool_lock = threading.Lock()
         self.fetch_command = [
             "python",
             "fetch_merged_scale_response.py",
@@ -43,7 +90,16 @@ class JsonFetcher:
             text=True,
         )
 
-        stdout, stderr = proc.communicate()
+        start = time.monotonic()
+        try:
+            stdout, stderr = proc.communicate(timeout=self.fetch_timeout_s)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            stdout, stderr = proc.communicate()
+            self.logger.error(
+                f"Command {command} timed out after {self.fetch_timeout_s} seconds"
+            )
+        add_to_current_span("subprocess_s", time.monotonic() - start)
 
         if stdout:
             self.logger.info(f"stdout: {stdout}")
@@ -52,47 +108,267 @@ class JsonFetcher:
 
         return proc.returncode
 
+    def get_worker_pool(self) -> ScaleFetchWorkerPool:
+        with self._worker_pool_lock:
+            if self.worker_pool is None:
+                self.worker_pool = ScaleFetchWorkerPool(
+                    self.scaleai_script_path, self.max_workers, self.logger
+                )
+            return self.worker_pool
+
+    def run_fetch(self, task_id: str):
+        """Runs the fetch script for a task with the configured backend and returns its exit code.
+
+        If the workers cannot load the fetch script, this and every later fetch fall back to
+        a subprocess.
+        """
+        if self.fetch_backend == self.FetchBackend.WORKERS:
+            start = time.monotonic()
+            try:
+                returncode, stdout, stderr = self.get_worker_pool().fetch(
+                    task_id, self.fetch_timeout_s
+                )
+            except FetchWorkerUnavailable as e:
+                self.logger.error(
+                    f"Fetch workers unavailable, falling back to a subprocess per task: {e}"
+                )
+                self.fetch_backend = self.FetchBackend.SUBPROCESS
+            else:
+                # The workers are subprocesses too, so their time is accounted the same way
+                add_to_current_span("subprocess_s", time.monotonic() - start)
+                if stdout:
+                    self.logger.info(f"stdout: {stdout}")
+                if stderr:
+                    self.logger.error(f"stderr: {stderr}")
+                return returncode
+        command = [arg.format(task_id=task_id) for arg in self.fetch_command]
+        return self.run_fetch_command(command)
+
+    def close(self):
+        """Stops the fetch workers, if any were started."""
+        with self._worker_pool_lock:
+            if self.worker_pool is not None:
+                self.worker_pool.close()
+                self.worker_pool = None
+
     def log_results(self):
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.logger.info(f"Results for {current_time}:")
         for task_id, result in self.result_list:
             self.logger.info(f"Task ID: {task_id}, Result: {result}")
 
+    @staticmethod
+    def link_or_copy(source: str, destination: str):
+        """Hard-links a file, falling back to a copy across filesystems."""
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+
+    @staticmethod
+    def matches_any(relative_path: str, patterns: List[str]) -> bool:
+        name = relative_path.rsplit("/", 1)[-1]
+        return any(
+            fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern)
+            for pattern in patterns
+        )
+
+    def is_wanted(self, relative_path: str) -> bool:
+        """Returns whether a file of a task folder is copied, given as a path relative to that folder."""
+        if self.include_patterns is not None and not self.matches_any(
+            relative_path, self.include_patterns
+        ):
+            return False
+        return not self.matches_any(relative_path, self.exclude_patterns)
+
+    def find_unwanted_files(self, source_folder: Path) -> List[str]:
+        if self.include_patterns is None and not self.exclude_patterns:
+            return []
+        return sorted(
+            file_path.relative_to(source_folder).as_posix()
+            for file_path in source_folder.rglob("*")
+            if file_path.is_file()
+            and not self.is_wanted(file_path.relative_to(source_folder).as_posix())
+        )
+
+    def transfer_folder(self, source_folder: Path, destination_folder: Path) -> List[str]:
+        """Transfers the wanted files of a task folder and returns the skipped ones."""
+        skipped_files = self.find_unwanted_files(source_folder)
+        if skipped_files:
+            self.transfer_wanted_files(source_folder, destination_folder, set(skipped_files))
+        elif self.transfer_mode == self.TransferMode.MOVE:
+            # shutil.move renames within a filesystem and copies across filesystems
+            shutil.move(str(source_folder), str(destination_folder))
+        elif self.transfer_mode == self.TransferMode.HARDLINK:
+            shutil.copytree(
+                source_folder, destination_folder, copy_function=self.link_or_copy
+            )
+        else:
+            shutil.copytree(source_folder, destination_folder)
+        return skipped_files
+
+    def transfer_wanted_files(
+        self, source_folder: Path, destination_folder: Path, skipped_files: set
+    ):
+        def ignore_skipped(directory, names):
+            relative_dir = Path(directory).relative_to(source_folder)
+            return [
+                name for name in names if (relative_dir / name).as_posix() in skipped_files
+            ]
+
+        if self.transfer_mode == self.TransferMode.MOVE:
+            # Only the wanted files are moved; the skipped ones are dropped with the source folder
+            for file_path in sorted(p for p in source_folder.rglob("*") if p.is_file()):
+                relative_path = file_path.relative_to(source_folder)
+                if relative_path.as_posix() in skipped_files:
+                    continue
+                (destination_folder / relative_path).parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(file_path), str(destination_folder / relative_path))
+            destination_folder.mkdir(parents=True, exist_ok=True)
+            shutil.rmtree(source_folder)
+        else:
+            copy_function = (
+                self.link_or_copy
+                if self.transfer_mode == self.TransferMode.HARDLINK
+                else shutil.copy2
+            )
+            shutil.copytree(
+                source_folder,
+                destination_folder,
+                ignore=ignore_skipped,
+                copy_function=copy_function,
+            )
+
     def copy_files(self, destination_path: Path, task_id: str):
         self.logger.info(f"Starting to copy files for task_id: {task_id}")
         try:
             source_folder = Path(self.scaleai_script_path) / task_id
             destination_folder = Path(destination_path) / task_id
+            # Transfer into a sibling folder first and swap it in afterwards, so an
+            # interrupted transfer never leaves a half-written task folder behind.
+            partial_folder = destination_folder.with_name(f"{task_id}.partial")
+            if partial_folder.exists():
+                shutil.rmtree(partial_folder)
+            self.logger.info(
+                f"Transferring ({self.transfer_mode.value}) from {source_folder} to {destination_folder}"
+            )
+            skipped_files = self.transfer_folder(source_folder, partial_folder)
+            self.skipped_files[task_id] = skipped_files
+            if skipped_files:
+                self.logger.info(
+                    f"Skipped {len(skipped_files)} files of task_id: {task_id}: {', '.join(skipped_files)}"
+                )
             if destination_folder.exists():
                 self.logger.info(
-                    f"Destination folder {destination_folder} exists. Removing it."
+                    f"Destination folder {destination_folder} exists. Replacing it."
                 )
-                shutil.rmtree(destination_folder)
-            self.logger.info(f"Copying from {source_folder} to {destination_folder}")
-            shutil.copytree(source_folder, destination_folder)
+                old_folder = destination_folder.with_name(f"{task_id}.old")
+                if old_folder.exists():
+                    shutil.rmtree(old_folder)
+                os.replace(destination_folder, old_folder)
+                os.replace(partial_folder, destination_folder)
+                shutil.rmtree(old_folder)
+            else:
+                os.replace(partial_folder, destination_folder)
             self.logger.info(f"Finished copying files for task_id: {task_id}")
+            return True
         except Exception as e:
             self.logger.error(f"Error while copying files for task_id: {task_id}")
             self.logger.exception(e)
+            return False
 
-    def run(self):
-        self.logger.info("Starting to fetch JSONs")
-        for task_id in tqdm(self.list_of_task_ids, desc="Fetching JSONs"):
-            self.logger.info(f"Fetching JSON for task_id: {task_id}")
-            command = [arg.format(task_id=task_id) for arg in self.fetch_command]
-            result = self.run_fetch_command(command)
-            if result == 0:
-                self.result_list.append((task_id, self.FetchResult.SUCCESS))
-            else:
-                self.result_list.append((task_id, self.FetchResult.FAILURE))
-        self.log_results()
+    def fetch_task(self, task_id: str):
+        """Fetches a single task and copies it as soon as the fetch succeeds."""
+        with measure(self.metrics, "fetch", task_id) as record:
+            task_id, result = self.fetch_and_copy_task(task_id)
+            record["success"] = result == self.FetchResult.SUCCESS
+            if record["success"] and self.metrics and self.destination_path:
+                record["bytes_written"] = folder_size(self.destination_path / task_id)
+            record["files_skipped"] = len(self.skipped_files.get(task_id, []))
+        return task_id, result
+
+    def fetch_and_copy_task(self, task_id: str):
+        self.logger.info(f"Fetching JSON for task_id: {task_id}")
+        result = self.run_fetch(task_id)
+        if result != 0:
+            if self.manifest:
+                self.manifest.record(task_id, self.FetchResult.FAILURE.name)
+            return task_id, self.FetchResult.FAILURE
 
+        if not self.manifest:
+            if self.destination_path and not self.copy_files(self.destination_path, task_id):
+                return task_id, self.FetchResult.FAILURE
+            return task_id, self.FetchResult.SUCCESS
+
+        content_hash, size = hash_folder(Path(self.scaleai_script_path) / task_id)
         if self.destination_path:
-            for task_id in self.list_of_task_ids:
-                self.copy_files(self.destination_path, task_id)
+            destination_folder = self.destination_path / task_id
+            if (
+                self.manifest.has_changed(task_id, content_hash)
+                or not destination_folder.exists()
+            ):
+                if not self.copy_files(self.destination_path, task_id):
+                    self.manifest.record(task_id, self.FetchResult.FAILURE.name)
+                    return task_id, self.FetchResult.FAILURE
+            else:
+                self.logger.info(
+                    f"Content of task_id: {task_id} unchanged, skipping copy"
+                )
+        self.manifest.record(
+            task_id,
+            self.FetchResult.SUCCESS.name,
+            content_hash,
+            size,
+            skipped_files=self.skipped_files.get(task_id),
+        )
+        return task_id, self.FetchResult.SUCCESS
+
+    def fetch_task_if_needed(self, task_id: str):
+        """Like `fetch_task`, but a task the manifest marks as up to date succeeds without fetching."""
+        if (
+            self.manifest
+            and self.destination_path
+            and not self.force_refresh
+            and self.manifest.is_up_to_date(task_id, self.destination_path)
+        ):
+            self.logger.info(f"Task ID: {task_id} is up to date, skipping fetch")
+            return task_id, self.FetchResult.SUCCESS
+        return self.fetch_task(task_id)
+
+    def tasks_to_fetch(self) -> List[str]:
+        """Returns the task ids that are not yet fetched successfully according to the manifest.
+
+        Every task id is returned once: a duplicate would be fetched into the same folder
+        and swapped through the same `.partial` folder concurrently.
+        """
+        unique_task_ids = list(dict.fromkeys(self.list_of_task_ids))
+        if not self.manifest or self.force_refresh or not self.destination_path:
+            return unique_task_ids
+
+        task_ids = []
+        for task_id in unique_task_ids:
+            if self.manifest.is_up_to_date(task_id, self.destination_path):
+                self.logger.info(f"Task ID: {task_id} is up to date, skipping fetch")
+            else:
+                task_ids.append(task_id)
+        return task_ids
+
+    def run(self):
+        task_ids = self.tasks_to_fetch()
+        self.logger.info(
+            f"Starting to fetch {len(task_ids)} JSONs with {self.max_workers} workers"
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.fetch_task, task_id) for task_id in task_ids]
+            for future in tqdm(
+                as_completed(futures), total=len(futures), desc="Fetching JSONs"
+            ):
+                self.result_list.append(future.result())
+        self.close()
+        self.log_results()
 
     def copy_files_without_triggering_scale_api(self):
         self.logger.info("Starting to copy files without triggering Scale API")
-        for task_id in self.list_of_task_ids:
+        for task_id in dict.fromkeys(self.list_of_task_ids):
             self.copy_files(self.destination_path, task_id)
         self.logger.info("Finished copying files without triggering Scale API")
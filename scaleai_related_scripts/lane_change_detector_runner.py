@@ -1,17 +1,38 @@
+import contextlib
+import hashlib
+import json
+import os
 import subprocess
 import logging
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, List, Optional
 from .parquet_creator import GTFinder
+from .gt_index import GTIndex, KIND_GT, KIND_OTHER_JSON, KIND_POSES
+from .gt_storage import find_json_files as find_stored_json_files
+from .pipeline_metrics import PipelineMetrics, add_to_current_span, file_size, measure
 
+LANE_CHANGE_CSV_FILENAME = "lane_change_included_gt_data.csv"
+LANE_CHANGE_STAMP_FILENAME = LANE_CHANGE_CSV_FILENAME + ".stamp"
+
+
+def find_json_files(base_path: str, gt_index: Optional[GTIndex] = None):
+    if gt_index:
+        return sorted(
+            path
+            for kind in (KIND_GT, KIND_POSES, KIND_OTHER_JSON)
+            for path in gt_index.paths(kind=kind)
+        )
 
-def find_json_files(base_path: str):
     logging.info(f"Searching for JSON files in {base_path}")
     base_dir = Path(base_path)
     if not base_dir.is_dir():
         logging.error(f"The provided path {base_path} is not a directory.")
         return []
 
-    json_files = list(base_dir.rglob("*.json"))
+    json_files = find_stored_json_files(base_dir)
     return json_files
 
 
@@ -41,10 +62,30 @@ class LaneChangeDetectorRunner:
         logger: logging.Logger,
         cwd_ddad: str,
         gt_finder: GTFinder,
+        batch_size: int = 50,
+        max_workers: Optional[int] = None,
+        session_timeout_s: Optional[float] = None,
+        force: bool = False,
+        metrics: Optional[PipelineMetrics] = None,
     ):
         self.logger = logger
         self.cwd_ddad = cwd_ddad
         self.gt_finder = gt_finder
+        self.batch_size = batch_size
+        self.max_workers = max_workers or os.cpu_count()
+        self.session_timeout_s = session_timeout_s
+        self.return_codes: Dict[str, int] = {}
+        self.force = force
+        self.metrics = metrics
+        self._fingerprint = None
+        self.target = (
+            "//application/adp_fca/tools/eval/examples:object_prediction_gt_example"
+        )
+        self.build_command = ["bazel", "build", "--config=gcc9", self.target]
+        self.binary_path = (
+            Path(cwd_ddad).resolve()
+            / "bazel-bin/application/adp_fca/tools/eval/examples/object_prediction_gt_example"
+        )
         self.command_raw = [
             "bazel",
             "run",
@@ -54,17 +95,35 @@ class LaneChangeDetectorRunner:
             "--json",
             "{json_file}",
         ]
+        self.batch_command_raw = [
+            "bazel",
+            "run",
+            "--config=gcc9",
+            "//application/adp_fca/tools/eval/examples:object_prediction_gt_example",
+            "--",
+            "--json-list",
+            "{json_list_file}",
+            "--failed-list",
+            "{failed_list_file}",
+        ]
 
-    def run_command(self, command):
+    def run_command(self, command, timeout_s: Optional[float] = None, cwd=None):
         proc = subprocess.Popen(
             command,
-            cwd=self.cwd_ddad,
+            cwd=cwd or self.cwd_ddad,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
         )
 
-        stdout, stderr = proc.communicate()
+        start = time.monotonic()
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout_s)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            stdout, stderr = proc.communicate()
+            self.logger.error(f"Command {command} timed out after {timeout_s} seconds")
+        add_to_current_span("subprocess_s", time.monotonic() - start)
 
         if stdout:
             self.logger.info(f"stdout: {stdout}")
@@ -73,9 +132,209 @@ class LaneChangeDetectorRunner:
 
         return proc.returncode
 
-    def run(self):
+    @staticmethod
+    def hash_file(file_path) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def detector_fingerprint(self) -> str:
+        """Identifies the detector version: the ddad commit, local changes to the eval tools and the build config."""
+        if self._fingerprint is None:
+            digest = hashlib.sha256(" ".join(self.build_command).encode("utf-8"))
+            for git_command in (
+                ["git", "rev-parse", "HEAD"],
+                ["git", "diff", "HEAD", "--", "application/adp_fca/tools/eval"],
+            ):
+                proc = subprocess.run(
+                    git_command, cwd=self.cwd_ddad, capture_output=True, text=True
+                )
+                digest.update(proc.stdout.encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def expected_stamp(self, json_file) -> dict:
+        return {
+            "json_sha256": self.hash_file(json_file),
+            "detector_fingerprint": self.detector_fingerprint(),
+        }
+
+    def is_up_to_date(self, json_file) -> bool:
+        output_dir = Path(json_file).parent
+        stamp_file = output_dir / LANE_CHANGE_STAMP_FILENAME
+        if not (output_dir / LANE_CHANGE_CSV_FILENAME).exists() or not stamp_file.exists():
+            return False
+        try:
+            with open(stamp_file, "r") as file:
+                stamp = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return False
+        return stamp == self.expected_stamp(json_file)
+
+    def write_stamp(self, json_file):
+        stamp_file = Path(json_file).parent / LANE_CHANGE_STAMP_FILENAME
+        with open(stamp_file, "w") as file:
+            json.dump(self.expected_stamp(json_file), file)
+
+    def find_files_to_process(self) -> List[Path]:
+        """Returns the GT files whose lane change csv is missing or outdated, or all of them with `force`."""
         json_files = self.gt_finder.find_gt_files()
+        if self.force:
+            return json_files
+
+        outdated_files = [f for f in json_files if not self.is_up_to_date(f)]
+        self.logger.info(
+            f"Skipping {len(json_files) - len(outdated_files)} up-to-date GT files"
+        )
+        return outdated_files
+
+    def run(self):
+        json_files = self.find_files_to_process()
         for json_file in json_files:
             self.logger.info(json_file)
             command = [arg.format(json_file=json_file) for arg in self.command_raw]
-            self.run_command(command)
+            with self.measure_detection(json_file) as record:
+                record["success"] = self.run_command(command) == 0
+            if record["success"]:
+                self.write_stamp(json_file)
+
+    def run_batched(self):
+        """Runs the detector once per batch of GT files instead of once per file.
+
+        The detector writes the files it failed on to a list, so the other files of a
+        batch are stamped and only the failed ones are run again next time.
+        """
+        json_files = self.find_files_to_process()
+        for start in range(0, len(json_files), self.batch_size):
+            batch = json_files[start : start + self.batch_size]
+            self.logger.info(f"Running lane change detection for a batch of {len(batch)} files")
+            with tempfile.TemporaryDirectory(prefix="lane_change_batch_") as batch_dir:
+                json_list_file = Path(batch_dir) / "json_list.txt"
+                failed_list_file = Path(batch_dir) / "failed_list.txt"
+                json_list_file.write_text("\n".join(str(Path(f).resolve()) for f in batch))
+                command = [
+                    arg.format(json_list_file=json_list_file, failed_list_file=failed_list_file)
+                    for arg in self.batch_command_raw
+                ]
+                with measure(self.metrics, "detect_batch", Path(batch[0]).parent.name) as record:
+                    returncode = self.run_command(command)
+                    record["files"] = len(batch)
+                    record["bytes_read"] = sum(file_size(f) for f in batch)
+                    failed_files = self.read_failed_files(batch, returncode, failed_list_file)
+                    record["success"] = not failed_files
+                    record["failed_files"] = len(failed_files)
+
+            for json_file in batch:
+                if str(Path(json_file).resolve()) in failed_files:
+                    self.logger.error(f"Lane change detection failed for {json_file}")
+                else:
+                    self.write_stamp(json_file)
+
+    def read_failed_files(self, batch, returncode: int, failed_list_file: Path) -> set:
+        """Returns the resolved paths of the batch files the detector failed on.
+
+        Without a failed list, e.g. because the detector crashed, a non-zero return code
+        fails the whole batch.
+        """
+        if failed_list_file.exists():
+            with open(failed_list_file, "r") as file:
+                return {str(Path(line.strip()).resolve()) for line in file if line.strip()}
+        if returncode == 0:
+            return set()
+        self.logger.error(
+            f"Lane change detector exited with return code {returncode} without a failed list, "
+            f"treating all {len(batch)} files of the batch as failed"
+        )
+        return {str(Path(json_file).resolve()) for json_file in batch}
+
+    def build(self) -> bool:
+        self.logger.info(f"Building {self.target}")
+        # Computed up front, so the workers never race to compute it
+        self.detector_fingerprint()
+        return self.run_command(self.build_command) == 0
+
+    @contextlib.contextmanager
+    def measure_detection(self, json_file):
+        """Records one detection of `json_file`, with the GT as bytes read and the csv as bytes written."""
+        with measure(self.metrics, "detect", Path(json_file).parent.name) as record:
+            record["json_file"] = str(json_file)
+            record["bytes_read"] = file_size(json_file)
+            yield record
+            record["bytes_written"] = file_size(
+                Path(json_file).parent / LANE_CHANGE_CSV_FILENAME
+            )
+
+    def run_built_binary(self, json_file) -> int:
+        command = [str(self.binary_path), "--json", str(Path(json_file).resolve())]
+        # The detector writes scratch files such as lane_gt_data.csv into its working
+        # directory, so every parallel run gets its own instead of sharing the ddad root
+        with self.measure_detection(json_file) as record, tempfile.TemporaryDirectory(
+            prefix="lane_change_detector_"
+        ) as run_dir:
+            returncode = self.run_command(
+                command, timeout_s=self.session_timeout_s, cwd=run_dir
+            )
+            record["success"] = returncode == 0
+        return returncode
+
+    def run_parallel(self):
+        """Builds the detector once and runs the built binary for every GT file in parallel.
+
+        Calling the binary directly avoids the Bazel server lock that serialises `bazel run`.
+        The return code of every GT file is collected in `return_codes`.
+        """
+        if not self.build():
+            self.logger.error(f"Building {self.target} failed, skipping lane change detection")
+            return
+
+        json_files = self.find_files_to_process()
+        self.logger.info(
+            f"Running lane change detection for {len(json_files)} files with {self.max_workers} workers"
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.run_built_binary, json_file): json_file
+                for json_file in json_files
+            }
+            for future in as_completed(futures):
+                json_file = futures[future]
+                returncode = future.result()
+                self.return_codes[str(json_file)] = returncode
+                if returncode != 0:
+                    self.logger.error(
+                        f"Lane change detection failed for {json_file} with return code {returncode}"
+                    )
+                else:
+                    self.write_stamp(json_file)
+
+        failed = sum(1 for returncode in self.return_codes.values() if returncode != 0)
+        self.logger.info(
+            f"Lane change detection finished: {len(self.return_codes) - failed} succeeded, {failed} failed"
+        )
+
+    def detect_in_folder(self, folder) -> bool:
+        """Runs the built binary for the outdated GT files of one task folder; needs `build` first.
+
+        Returns False if the folder holds no GT file or the detection failed for any of them.
+        """
+        json_files = GTFinder(str(folder), self.logger).find_gt_files()
+        if not json_files:
+            self.logger.error(f"No GT file found in {folder}, skipping lane change detection")
+            return False
+        success = True
+        for json_file in json_files:
+            if not self.force and self.is_up_to_date(json_file):
+                self.logger.info(f"{json_file} is up to date, skipping lane change detection")
+                continue
+            returncode = self.run_built_binary(json_file)
+            self.return_codes[str(json_file)] = returncode
+            if returncode == 0:
+                self.write_stamp(json_file)
+            else:
+                self.logger.error(
+                    f"Lane change detection failed for {json_file} with return code {returncode}"
+                )
+                success = False
+        return success
@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from .gt_index import GTIndex, KIND_GT, KIND_LANE_CHANGE_CSV, LANE_CHANGE_CSV_FILENAME, classify_file
+from .gt_storage import find_json_files
+from .lane_change_stats import LEFT_LANE_CHANGE_COLUMN, RIGHT_LANE_CHANGE_COLUMN
+
+# The lane change csv is written by the detector in ddad; these are the names its id and time columns may have
+OBJECT_ID_COLUMNS = ("object_id", "id", "ID", "track_id")
+TIMESTAMP_COLUMNS = ("timestamp", "timestamp_ns", "time")
+
+EVENTS_FILENAME = "lane_change_events.parquet"
+# Per source csv signature, used to only re-extract changed files
+EVENTS_MANIFEST_FILENAME = ".lane_change_events_manifest"
+# Small row groups keep the min/max statistics of the session column selective
+ROW_GROUP_SIZE = 10_000
+
+EVENT_COLUMNS = [
+    "session_id",
+    "task_id",
+    "object_id",
+    "direction",
+    "start_timestamp",
+    "end_timestamp",
+    "duration",
+    "source_file",
+]
+
+
+def first_existing_column(columns, candidates) -> Optional[str]:
+    for candidate in candidates:
+        if candidate in columns:
+            return candidate
+    return None
+
+
+def extract_lane_change_events(csv_path: str, session_id: str, task_id: str) -> pd.DataFrame:
+    """Turns the per-row lane change flags of one csv into one row per discrete lane change.
+
+    Consecutive rows of the same object with the flag set form one event.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    object_id_column = first_existing_column(header, OBJECT_ID_COLUMNS)
+    timestamp_column = first_existing_column(header, TIMESTAMP_COLUMNS)
+    if object_id_column is None or timestamp_column is None:
+        raise ValueError(f"No object id or timestamp column in {csv_path}")
+
+    flag_columns = [c for c in (LEFT_LANE_CHANGE_COLUMN, RIGHT_LANE_CHANGE_COLUMN) if c in header]
+    df = pd.read_csv(csv_path, usecols=[object_id_column, timestamp_column, *flag_columns])
+    df = df.sort_values([object_id_column, timestamp_column], kind="stable")
+
+    events = []
+    for direction, column in (("left", LEFT_LANE_CHANGE_COLUMN), ("right", RIGHT_LANE_CHANGE_COLUMN)):
+        if column not in df.columns:
+            continue
+        flag = df[column] == True
+        previous_flag = flag.groupby(df[object_id_column]).shift(fill_value=False)
+        event_number = (flag & ~previous_flag).cumsum()
+        flagged = df[flag]
+        direction_events = flagged.groupby(event_number[flag]).agg(
+            object_id=(object_id_column, "first"),
+            start_timestamp=(timestamp_column, "min"),
+            end_timestamp=(timestamp_column, "max"),
+        )
+        direction_events["direction"] = direction
+        events.append(direction_events)
+
+    if not events:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    events = pd.concat(events, ignore_index=True)
+    events["duration"] = events["end_timestamp"] - events["start_timestamp"]
+    events["session_id"] = session_id
+    events["task_id"] = task_id
+    events["source_file"] = csv_path
+    events["object_id"] = events["object_id"].astype(str)
+    return events[EVENT_COLUMNS]
+
+
+def extract_lane_change_events_or_error(args):
+    try:
+        return extract_lane_change_events(*args)
+    except Exception as e:
+        return e
+
+
+class LaneChangeEventIndex:
+    """Dataset-wide table of discrete lane change events.
+
+    `compact` extracts the events of every lane change csv under the base path into one
+    parquet file sorted by session, re-extracting only the csv files that changed since the
+    last compaction. `query` filters by session, direction, duration and time range and
+    lets the parquet reader skip the row groups whose statistics do not match.
+    """
+
+    def __init__(
+        self,
+        base_path: str,
+        logger: logging.Logger,
+        gt_index: Optional[GTIndex] = None,
+        events_path: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ):
+        self.base_path = Path(base_path)
+        self.logger = logger
+        self.gt_index = gt_index
+        self.events_path = Path(events_path) if events_path else self.base_path / EVENTS_FILENAME
+        self.manifest_path = self.events_path.with_name(EVENTS_MANIFEST_FILENAME)
+        self.max_workers = max_workers or os.cpu_count()
+
+    def find_csv_files(self) -> Dict[Path, str]:
+        """Maps every lane change csv to the session id of the GT JSON next to it."""
+        if self.gt_index:
+            sessions_by_dir = {
+                Path(row["path"]).parent: row["session_id"]
+                for row in self.gt_index.rows(kind=KIND_GT)
+            }
+            csv_files = self.gt_index.paths(kind=KIND_LANE_CHANGE_CSV)
+            return {csv_file: sessions_by_dir.get(csv_file.parent) for csv_file in csv_files}
+
+        csv_sessions = {}
+        for csv_file in sorted(self.base_path.rglob(LANE_CHANGE_CSV_FILENAME)):
+            csv_sessions[csv_file] = None
+            for json_file in find_json_files(csv_file.parent, recursive=False):
+                kind, metadata = classify_file(json_file)
+                if kind == KIND_GT:
+                    csv_sessions[csv_file] = metadata.get("session_id")
+                    break
+        return csv_sessions
+
+    def load_manifest(self) -> Dict[str, list]:
+        if not self.manifest_path.exists() or not self.events_path.exists():
+            return {}
+        with open(self.manifest_path, "r") as file:
+            return json.load(file)
+
+    def compact(self):
+        csv_sessions = self.find_csv_files()
+        manifest = self.load_manifest()
+        signatures = {}
+        for csv_file in list(csv_sessions):
+            try:
+                stat = csv_file.stat()
+            except FileNotFoundError:
+                # Listed by a stale index or deleted since the search
+                self.logger.warning(f"{csv_file} no longer exists, skipping it")
+                del csv_sessions[csv_file]
+                if self.gt_index:
+                    self.gt_index.remove(csv_file)
+                continue
+            signatures[str(csv_file)] = [stat.st_size, stat.st_mtime_ns]
+
+        unchanged = {path for path, signature in signatures.items() if manifest.get(path) == signature}
+        to_extract = [csv_file for csv_file in csv_sessions if str(csv_file) not in unchanged]
+        self.logger.info(
+            f"Extracting lane change events from {len(to_extract)} of {len(csv_sessions)} files"
+        )
+
+        tables = []
+        if unchanged:
+            previous = pd.read_parquet(self.events_path)
+            tables.append(previous[previous["source_file"].isin(unchanged)])
+
+        tasks = [
+            (str(csv_file), csv_sessions[csv_file] or csv_file.parent.name, csv_file.parent.name)
+            for csv_file in to_extract
+        ]
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(extract_lane_change_events_or_error, tasks, chunksize=16)
+            for (csv_path, _, _), result in zip(tasks, results):
+                if isinstance(result, Exception):
+                    self.logger.error(f"Error extracting lane change events from {csv_path}: {result}")
+                    signatures.pop(csv_path, None)
+                    continue
+                tables.append(result)
+
+        events = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=EVENT_COLUMNS)
+        events = events.sort_values(["session_id", "start_timestamp"], kind="stable")
+        tmp_path = self.events_path.with_name(self.events_path.name + ".tmp")
+        events.to_parquet(tmp_path, index=False, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, self.events_path)
+        with open(self.manifest_path, "w") as file:
+            json.dump(signatures, file)
+        self.logger.info(f"Wrote {len(events)} lane change events to {self.events_path}")
+
+    def query(
+        self,
+        session_id: Optional[str] = None,
+        direction: Optional[str] = None,
+        min_duration: Optional[float] = None,
+        max_duration: Optional[float] = None,
+        start_timestamp: Optional[float] = None,
+        end_timestamp: Optional[float] = None,
+    ) -> pd.DataFrame:
+        """Returns the events matching all given filters; the time range selects overlapping events."""
+        filters: List[tuple] = []
+        if session_id is not None:
+            filters.append(("session_id", "==", session_id))
+        if direction is not None:
+            filters.append(("direction", "==", direction))
+        if min_duration is not None:
+            filters.append(("duration", ">=", min_duration))
+        if max_duration is not None:
+            filters.append(("duration", "<=", max_duration))
+        if start_timestamp is not None:
+            filters.append(("end_timestamp", ">=", start_timestamp))
+        if end_timestamp is not None:
+            filters.append(("start_timestamp", "<=", end_timestamp))
+        return pd.read_parquet(self.events_path, filters=filters or None)
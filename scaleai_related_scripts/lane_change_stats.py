@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .gt_index import GTIndex, KIND_LANE_CHANGE_CSV, LANE_CHANGE_CSV_FILENAME
+from .gt_storage import LANE_CHANGE_STATS_CACHE_FILENAME
+
+RIGHT_LANE_CHANGE_COLUMN = "is_right_lane_change"
+LEFT_LANE_CHANGE_COLUMN = "is_left_lane_change"
+LANE_CHANGE_COLUMNS = (RIGHT_LANE_CHANGE_COLUMN, LEFT_LANE_CHANGE_COLUMN)
+
+# Below this many files to read, the process pool costs more than it saves
+MIN_FILES_FOR_POOL = 8
+
+
+def count_lane_changes_in_file(file_path: str) -> dict:
+    """Counts the True values of the two lane change columns, reading only those columns."""
+    try:
+        df = pd.read_csv(file_path, usecols=lambda column: column in LANE_CHANGE_COLUMNS)
+    except Exception as e:
+        return {"error": str(e)}
+    counts = {"missing_columns": [c for c in LANE_CHANGE_COLUMNS if c not in df.columns]}
+    for key, column in (("right", RIGHT_LANE_CHANGE_COLUMN), ("left", LEFT_LANE_CHANGE_COLUMN)):
+        counts[key] = int((df[column] == True).sum()) if column in df.columns else 0
+    return counts
+
+
+class LaneChangeStats:
+    """Counts right and left lane changes over many lane change csv files.
+
+    Only the two lane change columns are read, the files are spread over a process pool,
+    and the counts of every file are cached by path, size and mtime, so a re-run over an
+    unchanged snapshot reads no csv at all.
+    """
+
+    def __init__(
+        self,
+        base_path: str,
+        logger: logging.Logger,
+        gt_index: Optional[GTIndex] = None,
+        cache_path: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ):
+        self.base_path = Path(base_path)
+        self.logger = logger
+        self.gt_index = gt_index
+        self.cache_path = Path(cache_path) if cache_path else self.base_path / LANE_CHANGE_STATS_CACHE_FILENAME
+        self.max_workers = max_workers or os.cpu_count()
+        self.cache: Dict[str, dict] = {}
+        self.load_cache()
+
+    def load_cache(self):
+        if not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, "r") as file:
+                self.cache = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.error(f"Could not read lane change stats cache {self.cache_path}: {e}")
+            self.cache = {}
+
+    def save_cache(self):
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(self.cache, file)
+        os.replace(tmp_path, self.cache_path)
+
+    def find_files(self) -> List[Path]:
+        if self.gt_index:
+            return self.gt_index.paths(kind=KIND_LANE_CHANGE_CSV)
+        return sorted(self.base_path.rglob(LANE_CHANGE_CSV_FILENAME))
+
+    def count_files(self, file_paths: Iterable[Path]) -> Dict[Path, Tuple[int, int]]:
+        """Returns (right_count, left_count) of every readable file.
+
+        Files that no longer exist, e.g. listed by a stale index, are logged and skipped.
+        """
+        file_paths = list(file_paths)
+        signatures = {}
+        to_read = []
+        for file_path in file_paths:
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                self.logger.warning(f"{file_path} no longer exists, skipping it")
+                self.cache.pop(str(file_path), None)
+                continue
+            signatures[file_path] = [stat.st_size, stat.st_mtime_ns]
+            cached = self.cache.get(str(file_path))
+            if not cached or cached["signature"] != signatures[file_path]:
+                to_read.append(file_path)
+
+        self.logger.info(
+            f"Reading {len(to_read)} of {len(file_paths)} lane change files, the rest is cached"
+        )
+        if len(to_read) >= MIN_FILES_FOR_POOL:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(
+                    executor.map(count_lane_changes_in_file, map(str, to_read), chunksize=16)
+                )
+        else:
+            results = [count_lane_changes_in_file(str(file_path)) for file_path in to_read]
+
+        for file_path, counts in zip(to_read, results):
+            if "error" in counts:
+                self.logger.error(f"Error reading {file_path}: {counts['error']}")
+                self.cache.pop(str(file_path), None)
+                continue
+            for column in counts["missing_columns"]:
+                self.logger.warning(f"'{column}' column not found in {file_path}")
+            self.cache[str(file_path)] = {"signature": signatures[file_path], **counts}
+        if to_read:
+            self.save_cache()
+
+        return {
+            file_path: (self.cache[str(file_path)]["right"], self.cache[str(file_path)]["left"])
+            for file_path in file_paths
+            if file_path in signatures and str(file_path) in self.cache
+        }
+
+    def count_total(self) -> Tuple[int, int]:
+        """Returns the total right and left lane changes of all lane change files under the base path."""
+        counts = self.count_files(self.find_files()).values()
+        return sum(right for right, _ in counts), sum(left for _, left in counts)
+
+    def count_per_session(
+        self, target_filename: str = LANE_CHANGE_CSV_FILENAME
+    ) -> Tuple[List[Tuple[Path, int, int]], List[Path]]:
+        """Counts per first-level directory and lists the first-level directories missing the file.
+
+        Returns (containing_info, missing_dirs) where containing_info holds
+        (dir, right_count, left_count).
+        """
+        if self.gt_index and target_filename == LANE_CHANGE_CSV_FILENAME:
+            existing_files = set(self.gt_index.paths(kind=KIND_LANE_CHANGE_CSV))
+        else:
+            existing_files = None
+
+        session_dirs = sorted(entry for entry in self.base_path.iterdir() if entry.is_dir())
+        present, missing_dirs = [], []
+        for session_dir in session_dirs:
+            file_path = session_dir / target_filename
+            exists = file_path in existing_files if existing_files is not None else file_path.exists()
+            (present if exists else missing_dirs).append(session_dir)
+
+        counts = self.count_files(session_dir / target_filename for session_dir in present)
+        containing_info = []
+        for session_dir in present:
+            file_path = session_dir / target_filename
+            if file_path in counts:
+                containing_info.append((session_dir, *counts[file_path]))
+            elif not file_path.exists():
+                missing_dirs.append(session_dir)
+            else:
+                # The file exists but could not be read
+                containing_info.append((session_dir, 0, 0))
+        return containing_info, sorted(missing_dirs)
@@ -8,8 +8,26 @@ import logging
 import requests
 from requests.auth import HTTPBasicAuth
 import os
+import copy
 import json
+import time
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from .gt_index import GTIndex, KIND_GT, KIND_POSES, classify_file
+from .gt_metadata import read_gt_metadata
+from .gt_storage import find_json_files, read_gt_json
+from .raas_submitter import RaasJobSubmitter
+from .pipeline_metrics import PipelineMetrics, measure
+from .reprocessing_planner import ReprocessingWindow, plan_reprocessing_windows
+from .raas_job_ledger import (
+    RaasJobLedger,
+    STATE_SUBMITTED,
+    STATE_SUBMIT_FAILED,
+    STATE_UNKNOWN_ID,
+    job_id_from_response,
+    job_state_from_response,
+    output_path_from_response,
+)
 
 SUBMIT_JOB_URL = (
     "https://jms-fca-sensor-reprocessing.apps.usprd.p4avd.fcagroup.com/v1/jobs"
@@ -33,15 +51,17 @@ def parse_arguments():
 
 
 def extract_metadata_from_gt_json(file_path):
-    data = parse_input_file(file_path)
-    session, start_timestamp, end_timestamp = extract_session_meta_data(data)
+    metadata = read_gt_metadata(file_path)
+    if metadata is None:
+        raise KeyError(f"No metadata found in {file_path}")
+    session, start_timestamp, end_timestamp = extract_session_meta_data(
+        {"metadata": metadata}
+    )
     return session, start_timestamp, end_timestamp
 
 
 def parse_input_file(file_path):
-    with open(file_path, "r") as file:
-        data = json.load(file)
-    return data
+    return read_gt_json(file_path)
 
 
 def extract_session_meta_data(data):
@@ -61,19 +81,47 @@ def submit_raas_job(username, password, data):
 
 class GTFinder:
 
-    def __init__(self, base_path: str, logger: logging.Logger):
+    def __init__(
+        self,
+        base_path: str,
+        logger: logging.Logger,
+        gt_index: Optional[GTIndex] = None,
+    ):
         self.base_path = base_path
         self.logger = logger
+        self.gt_index = gt_index
 
-    def find_gt_files(self):
-        self.logger.info(f"Searching for GT files in {self.base_path}")
+    def find_files(self, kinds: Iterable[str]) -> List[Path]:
+        """Returns the JSON files under the base path whose kind (see gt_index) is in `kinds`."""
+        kinds = set(kinds)
+        if self.gt_index:
+            self.logger.info(f"Looking up {sorted(kinds)} files in the index of {self.base_path}")
+            return sorted(
+                path for kind in kinds for path in self.gt_index.paths(kind=kind)
+            )
+
+        self.logger.info(f"Searching for {sorted(kinds)} files in {self.base_path}")
         base_dir = Path(self.base_path)
         if not base_dir.is_dir():
             self.logger.error(f"The provided path {self.base_path} is not a directory.")
             return []
 
-        gt_files = list(base_dir.rglob("*.json"))
-        return gt_files
+        files = []
+        for json_file in find_json_files(base_dir):
+            try:
+                kind, _ = classify_file(json_file)
+            except OSError as e:
+                self.logger.error(f"Error reading {json_file}: {e}")
+                continue
+            if kind in kinds:
+                files.append(json_file)
+        return sorted(files)
+
+    def find_gt_files(self):
+        return self.find_files([KIND_GT])
+
+    def find_poses_files(self):
+        return self.find_files([KIND_POSES])
 
 
 class ParquetCreator:
@@ -86,6 +134,10 @@ class ParquetCreator:
         password_p4avd: str,
         gt_finder: GTFinder,
         logger: logging.Logger,
+        submitter: Optional[RaasJobSubmitter] = None,
+        window_gap_tolerance_ns: int = 0,
+        ledger: Optional[RaasJobLedger] = None,
+        metrics: Optional[PipelineMetrics] = None,
     ):
         self.gt_file_base_path = gt_file_base_path
         self.username_p4avd = username_p4avd
@@ -95,6 +147,10 @@ class ParquetCreator:
 
         self.start_timestamp_offset_ns = 20 * 1_000_000_000  # 20 seconds in nanoseconds
         self.end_timestamp_offset_ns = 5 * 1_000_000_000  # 5 seconds in nanoseconds
+        # Padded windows of one session that are at most this far apart are reprocessed by one job
+        self.window_gap_tolerance_ns = window_gap_tolerance_ns
+        # Maps every GT file to the merged window whose job covers it
+        self.gt_file_to_window: Dict[str, ReprocessingWindow] = {}
 
         self.session = None
         self.start_timestamp = None
@@ -117,10 +173,18 @@ class ParquetCreator:
             "loggerEndTime": "",
         }
 
+        self.metrics = metrics
+        self.submitter = submitter or RaasJobSubmitter(
+            username_p4avd, password_p4avd, logger, self.SUBMIT_JOB_URL, metrics=metrics
+        )
+        self.ledger = ledger
+
+    @property
+    def software_version(self) -> str:
+        return ",".join(rpu["software_version"] for rpu in self.request_body["RPUs"])
+
     def parse_gt_file(self, gt_file_path: str):
-        with open(gt_file_path, "r") as file:
-            data = json.load(file)
-        return data
+        return read_gt_json(gt_file_path)
 
     def extract_session_meta_data(self, data):
         metadata = data["metadata"]
@@ -129,16 +193,31 @@ class ParquetCreator:
         self.end_timestamp = metadata["end_timestamp"]
 
     def extract_metadata_from_gt_json(self, gt_file_path: str):
-        data = self.parse_gt_file(gt_file_path)
-        self.extract_session_meta_data(data)
+        metadata = read_gt_metadata(gt_file_path)
+        if metadata is None:
+            raise KeyError(f"No metadata found in {gt_file_path}")
+        self.extract_session_meta_data({"metadata": metadata})
 
-    def request_body_builder(self, session, start_timestamp, end_timestamp):
-        self.request_body["session"] = session
-        self.request_body["loggerStartTime"] = (
-            start_timestamp - self.start_timestamp_offset_ns
+    def build_request_body(self, session, start_timestamp, end_timestamp) -> dict:
+        """Returns a new request body for the padded GT window, leaving `request_body` untouched."""
+        return self.build_window_request_body(
+            session,
+            int(start_timestamp) - self.start_timestamp_offset_ns,
+            int(end_timestamp) + self.end_timestamp_offset_ns,
         )
-        self.request_body["loggerEndTime"] = (
-            end_timestamp + self.end_timestamp_offset_ns
+
+    def build_window_request_body(
+        self, session, logger_start_time: int, logger_end_time: int
+    ) -> dict:
+        request_body = copy.deepcopy(self.request_body)
+        request_body["session"] = session
+        request_body["loggerStartTime"] = logger_start_time
+        request_body["loggerEndTime"] = logger_end_time
+        return request_body
+
+    def request_body_builder(self, session, start_timestamp, end_timestamp):
+        self.request_body = self.build_request_body(
+            session, start_timestamp, end_timestamp
         )
 
     def submit_raas_job(self):
@@ -150,15 +229,164 @@ class ParquetCreator:
         )
         return response
 
+    def collect_gt_windows(self) -> List[Tuple[Path, str, int, int]]:
+        """Returns (gt_file, session, start_timestamp, end_timestamp) of every GT file."""
+        gt_index = self.gt_finder.gt_index
+        if gt_index:
+            return [
+                (
+                    Path(row["path"]),
+                    row["session_id"],
+                    row["start_timestamp"],
+                    row["end_timestamp"],
+                )
+                for row in gt_index.rows(kind=KIND_GT)
+                if row["start_timestamp"] is not None and row["end_timestamp"] is not None
+            ]
+
+        gt_windows = []
+        for gt_file in self.gt_finder.find_gt_files():
+            self.logger.info(f"Extracting GT file: {gt_file}")
+            try:
+                session, start_timestamp, end_timestamp = extract_metadata_from_gt_json(
+                    gt_file
+                )
+            except (OSError, ValueError, KeyError) as e:
+                self.logger.error(f"Error extracting metadata from {gt_file}: {e}")
+                continue
+            gt_windows.append((gt_file, session, start_timestamp, end_timestamp))
+        return gt_windows
+
+    def plan_windows(self) -> List[ReprocessingWindow]:
+        gt_windows = self.collect_gt_windows()
+        windows = plan_reprocessing_windows(
+            gt_windows,
+            self.start_timestamp_offset_ns,
+            self.end_timestamp_offset_ns,
+            self.window_gap_tolerance_ns,
+        )
+        self.gt_file_to_window = {
+            str(gt_file): window for window in windows for gt_file in window.gt_files
+        }
+        self.logger.info(
+            f"Planned {len(windows)} RAAS jobs for {len(gt_windows)} GT files"
+        )
+        return windows
+
+    def record_response(self, window: ReprocessingWindow, response):
+        if not self.ledger:
+            return
+        job_id, state = None, STATE_SUBMIT_FAILED
+        if not isinstance(response, Exception) and response.ok:
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            job_id = job_id_from_response(data)
+            state = job_state_from_response(data) or STATE_SUBMITTED
+            if job_id is None:
+                self.logger.warning(
+                    f"RAAS response for {window} has no job id, it cannot be polled and is "
+                    f"submitted again by the next run: {data}"
+                )
+                state = STATE_UNKNOWN_ID
+        self.ledger.record_submission(
+            window.session,
+            window.logger_start_time,
+            window.logger_end_time,
+            self.software_version,
+            job_id,
+            state,
+            [str(gt_file) for gt_file in window.gt_files],
+        )
+
     def run(self):
-        gt_files = self.gt_finder.find_gt_files()
-        for gt_file in gt_files:
-            gt_file_path = gt_file
-            self.logger.info(f"Extracting GT file: {gt_file_path}")
-            self.extract_metadata_from_gt_json(gt_file_path)
-            self.request_body_builder(
-                self.session, self.start_timestamp, self.end_timestamp
+        with measure(self.metrics, "parquet", "all") as record:
+            self.submit_windows(record)
+
+    def submit_windows(self, record: dict):
+        windows = self.plan_windows()
+        if self.ledger:
+            planned_count = len(windows)
+            windows = [
+                window
+                for window in windows
+                if self.ledger.needs_submission(
+                    window.session,
+                    window.logger_start_time,
+                    window.logger_end_time,
+                    self.software_version,
+                )
+            ]
+            self.logger.info(
+                f"Skipping {planned_count - len(windows)} windows that already have a RAAS job"
             )
-            response = self.submit_raas_job()
-            self.logger.info(f"Response: {json.dumps(response.json(), indent=4)}")
+        request_bodies = [
+            self.build_window_request_body(
+                window.session, window.logger_start_time, window.logger_end_time
+            )
+            for window in windows
+        ]
+
+        self.logger.info(f"Submitting {len(request_bodies)} RAAS jobs")
+        record["jobs"] = len(request_bodies)
+        results = self.submitter.submit_all(request_bodies)
+        for window, (request_body, response) in zip(windows, results):
+            gt_files = ", ".join(str(gt_file) for gt_file in window.gt_files)
+            self.logger.info(f"Job for {window} covers GT files: {gt_files}")
+            self.record_response(window, response)
+            if isinstance(response, Exception) or not response.ok:
+                record["success"] = False
+            if isinstance(response, Exception):
+                self.logger.error(
+                    f"Submitting job for session {request_body['session']} failed: {response}"
+                )
+                continue
+            try:
+                self.logger.info(f"Response: {json.dumps(response.json(), indent=4)}")
+            except ValueError:
+                self.logger.info(f"Response: {response.text}")
             self.logger.info(f"Status code: {response.status_code}")
+
+    def poll_jobs(self, interval_s: float = 60.0, timeout_s: Optional[float] = None):
+        """Polls all unfinished jobs of the ledger concurrently until they finish or `timeout_s` passes."""
+        if not self.ledger:
+            self.logger.error("Polling RAAS jobs needs a job ledger")
+            return
+
+        deadline = time.monotonic() + timeout_s if timeout_s is not None else None
+        while True:
+            job_ids = self.ledger.pending_job_ids()
+            if not job_ids:
+                unknown_id_rows = self.ledger.unknown_id_rows()
+                if unknown_id_rows:
+                    self.logger.warning(
+                        f"All pollable RAAS jobs finished, but {len(unknown_id_rows)} submissions "
+                        "got no job id and are submitted again by the next run: "
+                        + ", ".join(
+                            f"{row['session']} [{row['logger_start_time']}, {row['logger_end_time']}]"
+                            for row in unknown_id_rows
+                        )
+                    )
+                else:
+                    self.logger.info("All RAAS jobs finished")
+                return
+            self.logger.info(f"Polling {len(job_ids)} unfinished RAAS jobs")
+            for job_id, response in self.submitter.get_jobs(job_ids):
+                if isinstance(response, Exception) or not response.ok:
+                    self.logger.error(f"Polling job {job_id} failed: {response}")
+                    continue
+                try:
+                    data = response.json()
+                except ValueError:
+                    self.logger.error(f"Polling job {job_id} returned no JSON: {response.text}")
+                    continue
+                state = job_state_from_response(data)
+                if state:
+                    self.ledger.update_state(job_id, state, output_path_from_response(data))
+            if deadline is not None and time.monotonic() + interval_s > deadline:
+                self.logger.warning(
+                    f"Stopped polling with {len(self.ledger.pending_job_ids())} unfinished RAAS jobs"
+                )
+                return
+            time.sleep(interval_s)
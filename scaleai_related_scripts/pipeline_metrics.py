@@ -0,0 +1,174 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Spans that are open in the current thread; subprocess helpers add their time to the innermost one
+_local = threading.local()
+
+
+def _span_stack() -> List[dict]:
+    if not hasattr(_local, "spans"):
+        _local.spans = []
+    return _local.spans
+
+
+def add_to_current_span(field: str, value: float):
+    """Adds `value` to `field` of the innermost open span of this thread, if there is one."""
+    spans = _span_stack()
+    if spans:
+        spans[-1][field] = spans[-1].get(field, 0) + value
+
+
+def folder_size(folder: Path) -> int:
+    total_size = 0
+    for root, _, files in os.walk(folder):
+        for file in files:
+            try:
+                total_size += os.stat(os.path.join(root, file)).st_size
+            except OSError:
+                pass
+    return total_size
+
+
+def file_size(file_path) -> int:
+    try:
+        return os.stat(file_path).st_size
+    except OSError:
+        return 0
+
+
+@contextlib.contextmanager
+def measure(metrics: Optional["PipelineMetrics"], stage: str, task: str):
+    """Measures the wall time of the block as one record of `stage` for `task`.
+
+    The block may set `success`, `bytes_read`, `bytes_written` or other fields on the
+    yielded record; an exception marks it as failed. Without `metrics` nothing is recorded.
+    """
+    record = {
+        "stage": stage,
+        "task": str(task),
+        "success": True,
+        "subprocess_s": 0.0,
+        "bytes_read": 0,
+        "bytes_written": 0,
+    }
+    spans = _span_stack()
+    spans.append(record)
+    start = time.monotonic()
+    try:
+        yield record
+    except Exception:
+        record["success"] = False
+        raise
+    finally:
+        record["wall_s"] = time.monotonic() - start
+        spans.pop()
+        if metrics is not None:
+            metrics.record(record)
+
+
+class PipelineMetrics:
+    """Collects one record per stage and task and writes them as JSON lines and a Prometheus textfile."""
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        jsonl_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+    ):
+        self.logger = logger
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.prometheus_path = Path(prometheus_path) if prometheus_path else None
+        self.records: List[dict] = []
+        self._lock = threading.Lock()
+        if self.jsonl_path:
+            self.jsonl_path.write_text("")
+
+    def record(self, record: dict):
+        record = {"timestamp": time.time(), **record}
+        with self._lock:
+            self.records.append(record)
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a") as file:
+                    file.write(json.dumps(record) + "\n")
+
+    def summarize(self) -> Dict[str, dict]:
+        summary: Dict[str, dict] = defaultdict(
+            lambda: {
+                "tasks": 0,
+                "failures": 0,
+                "wall_s": [],
+                "subprocess_s": 0.0,
+                "bytes_read": 0,
+                "bytes_written": 0,
+            }
+        )
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            stage = summary[record["stage"]]
+            stage["tasks"] += 1
+            stage["failures"] += 0 if record["success"] else 1
+            stage["wall_s"].append(record["wall_s"])
+            stage["subprocess_s"] += record["subprocess_s"]
+            stage["bytes_read"] += record["bytes_read"]
+            stage["bytes_written"] += record["bytes_written"]
+        return dict(summary)
+
+    def write_prometheus(self, summary: Dict[str, dict]):
+        lines = [
+            "# HELP gt_pipeline_tasks_total Tasks processed per stage and result.",
+            "# TYPE gt_pipeline_tasks_total counter",
+        ]
+        for stage, values in summary.items():
+            lines.append(
+                f'gt_pipeline_tasks_total{{stage="{stage}",result="success"}} '
+                f"{values['tasks'] - values['failures']}"
+            )
+            lines.append(
+                f'gt_pipeline_tasks_total{{stage="{stage}",result="failure"}} {values["failures"]}'
+            )
+        for metric, field, help_text in (
+            ("gt_pipeline_wall_seconds_total", "wall_s", "Wall time spent per stage."),
+            ("gt_pipeline_subprocess_seconds_total", "subprocess_s", "Time spent waiting on subprocesses per stage."),
+            ("gt_pipeline_bytes_read_total", "bytes_read", "Bytes read per stage."),
+            ("gt_pipeline_bytes_written_total", "bytes_written", "Bytes written per stage."),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for stage, values in summary.items():
+                value = sum(values[field]) if field == "wall_s" else values[field]
+                lines.append(f'{metric}{{stage="{stage}"}} {value}')
+        # Written to a temporary file first, so node_exporter never reads a partial file
+        tmp_path = self.prometheus_path.with_name(self.prometheus_path.name + ".tmp")
+        tmp_path.write_text("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prometheus_path)
+
+    def finish(self) -> str:
+        """Writes the Prometheus textfile and logs and returns a summary table per stage."""
+        summary = self.summarize()
+        if self.prometheus_path:
+            self.write_prometheus(summary)
+
+        header = (
+            f"{'stage':<16}{'tasks':>7}{'failed':>8}{'wall s':>11}{'p50 s':>9}"
+            f"{'max s':>9}{'subproc s':>11}{'MB read':>10}{'MB written':>12}"
+        )
+        rows = [header, "-" * len(header)]
+        for stage, values in summary.items():
+            wall_times = sorted(values["wall_s"])
+            rows.append(
+                f"{stage:<16}{values['tasks']:>7}{values['failures']:>8}"
+                f"{sum(wall_times):>11.1f}{wall_times[len(wall_times) // 2]:>9.1f}"
+                f"{wall_times[-1]:>9.1f}{values['subprocess_s']:>11.1f}"
+                f"{values['bytes_read'] / 1e6:>10.1f}{values['bytes_written'] / 1e6:>12.1f}"
+            )
+        table = "\n".join(rows)
+        self.logger.info(f"Pipeline metrics summary:\n{table}")
+        return table
@@ -0,0 +1,97 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Put on a queue once per downstream worker when the upstream stage is finished
+_END = object()
+
+
+class Stage:
+    """One step of the pipeline, applied to every item by `workers` threads.
+
+    `function` returns the item that is handed to the next stage, or None to drop the
+    item, e.g. because its fetch failed.
+    """
+
+    def __init__(self, name: str, function: Callable[[Any], Optional[Any]], workers: int = 1):
+        self.name = name
+        self.function = function
+        self.workers = workers
+
+
+class PipelineScheduler:
+    """Streams items through a chain of stages connected by bounded queues.
+
+    Every item flows through the stages on its own, so a later stage starts on the first
+    item while earlier stages still work on the others, and the total wall time is close to
+    that of the slowest stage instead of the sum of all stages.
+    """
+
+    def __init__(self, stages: List[Stage], logger: logging.Logger, queue_size: int = 8):
+        self.stages = stages
+        self.logger = logger
+        self.queue_size = queue_size
+        # Maps every stage name to the items it failed or dropped
+        self.failures: Dict[str, List[Any]] = {stage.name: [] for stage in stages}
+        self.completed: List[Any] = []
+        self._lock = threading.Lock()
+
+    def worker(self, stage: Stage, input_queue: queue.Queue, output_queue: Optional[queue.Queue]):
+        while True:
+            item = input_queue.get()
+            if item is _END:
+                return
+            try:
+                result = stage.function(item)
+            except Exception as e:
+                self.logger.error(f"Stage {stage.name} failed for {item}")
+                self.logger.exception(e)
+                result = None
+            if result is None:
+                with self._lock:
+                    self.failures[stage.name].append(item)
+            elif output_queue is not None:
+                output_queue.put(result)
+            else:
+                with self._lock:
+                    self.completed.append(result)
+
+    def run(self, items: Iterable[Any]):
+        if not self.stages:
+            return
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        stage_threads = []
+        for index, stage in enumerate(self.stages):
+            output_queue = queues[index + 1] if index + 1 < len(self.stages) else None
+            threads = [
+                threading.Thread(
+                    target=self.worker,
+                    args=(stage, queues[index], output_queue),
+                    name=f"{stage.name}-{number}",
+                    daemon=True,
+                )
+                for number in range(stage.workers)
+            ]
+            for thread in threads:
+                thread.start()
+            stage_threads.append(threads)
+
+        self.logger.info(
+            "Starting pipeline with stages: "
+            + ", ".join(f"{stage.name} ({stage.workers} workers)" for stage in self.stages)
+        )
+        for item in items:
+            queues[0].put(item)
+
+        # Shut the stages down in order: once all workers of a stage are done, the next one can stop
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                queues[index].put(_END)
+            for thread in stage_threads[index]:
+                thread.join()
+            self.logger.info(f"Stage {stage.name} finished")
+
+        for stage_name, failed_items in self.failures.items():
+            if failed_items:
+                self.logger.error(f"Stage {stage_name} failed or dropped {len(failed_items)} items")
@@ -1,16 +1,41 @@
 from pathlib import Path
+from typing import Optional
 import logging
+from .gt_index import GTIndex, KIND_POSES, POSES_FILENAME
+from .gt_storage import uncompressed_name
+from .pipeline_metrics import PipelineMetrics, measure
 
-def remove_poses_json(base_path: str):
+def remove_poses_json(
+    base_path: str,
+    gt_index: Optional[GTIndex] = None,
+    metrics: Optional[PipelineMetrics] = None,
+):
     base_dir = Path(base_path)
     if not base_dir.is_dir():
         logging.error(f"The provided path {base_path} is not a directory.")
         return
 
-    # Iterate over all files named 'poses.json' in the directory and subdirectories
-    for poses_file in base_dir.rglob("poses.json"):
+    with measure(metrics, "remove_poses", base_dir.name) as record:
+        record["files_removed"] = 0
+        record["bytes_removed"] = 0
+        _remove_poses_files(base_dir, gt_index, record)
+
+def _remove_poses_files(base_dir: Path, gt_index: Optional[GTIndex], record: dict):
+    # Iterate over all 'poses.json' files, plain or compressed, in the directory and subdirectories
+    if gt_index:
+        candidates = gt_index.paths(kind=KIND_POSES)
+    else:
+        candidates = base_dir.rglob(f"{POSES_FILENAME}*")
+    poses_files = [path for path in candidates if uncompressed_name(path) == POSES_FILENAME]
+    for poses_file in poses_files:
         try:
+            size = poses_file.stat().st_size
             poses_file.unlink()
+            record["files_removed"] += 1
+            record["bytes_removed"] += size
             logging.info(f"Removed file: {poses_file}")
+            if gt_index:
+                gt_index.remove(poses_file)
         except Exception as e:
+            record["success"] = False
             logging.error(f"Error removing file {poses_file}: {e}")
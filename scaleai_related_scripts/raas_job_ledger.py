@@ -0,0 +1,169 @@
+import datetime
+import json
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .gt_storage import RAAS_LEDGER_FILENAME
+
+STATE_SUBMITTED = "SUBMITTED"
+STATE_SUBMIT_FAILED = "SUBMIT_FAILED"
+# RAAS accepted the request but its response had no job id, so the job cannot be polled
+STATE_UNKNOWN_ID = "UNKNOWN_ID"
+# States reported by RAAS after which a job does not change any more
+SUCCESS_STATES = {"COMPLETED", "SUCCEEDED", "SUCCESS", "FINISHED", "DONE"}
+FAILURE_STATES = {"FAILED", "FAILURE", "ERROR", "CANCELLED", "CANCELED", "ABORTED"}
+TERMINAL_STATES = SUCCESS_STATES | FAILURE_STATES | {STATE_SUBMIT_FAILED}
+# Windows in these states are submitted again by the next run
+RESUBMIT_STATES = FAILURE_STATES | {STATE_SUBMIT_FAILED, STATE_UNKNOWN_ID}
+
+
+def first_present(data: dict, keys) -> Optional[str]:
+    """Returns the first of `keys` present in `data`; the RAAS responses are not versioned."""
+    if not isinstance(data, dict):
+        return None
+    for key in keys:
+        if data.get(key) not in (None, ""):
+            return data[key]
+    return None
+
+
+def job_id_from_response(data: dict) -> Optional[str]:
+    return first_present(data, ("id", "job_id", "jobId", "uuid"))
+
+
+def job_state_from_response(data: dict) -> Optional[str]:
+    state = first_present(data, ("status", "state", "job_status", "jobStatus"))
+    return str(state).upper() if state is not None else None
+
+
+def output_path_from_response(data: dict) -> Optional[str]:
+    return first_present(
+        data, ("output_path", "outputPath", "output", "parquet_path", "parquetPath")
+    )
+
+
+class RaasJobLedger:
+    """SQLite ledger of the submitted RAAS jobs.
+
+    Jobs are keyed by (session, logger window, RPU software version), so a retried pipeline
+    only submits windows that have no job yet or whose job failed, and the poller records
+    the state and output location of every job.
+    """
+
+    def __init__(self, base_path: str, ledger_path: Optional[str] = None):
+        self.ledger_path = Path(ledger_path) if ledger_path else Path(base_path) / RAAS_LEDGER_FILENAME
+        self.ledger_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.ledger_path))
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                session TEXT NOT NULL,
+                logger_start_time INTEGER NOT NULL,
+                logger_end_time INTEGER NOT NULL,
+                software_version TEXT NOT NULL,
+                job_id TEXT,
+                state TEXT NOT NULL,
+                output_path TEXT,
+                gt_files TEXT,
+                submitted_at TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (session, logger_start_time, logger_end_time, software_version)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_job_id ON jobs (job_id);
+            """
+        )
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def now() -> str:
+        return datetime.datetime.now().isoformat(timespec="seconds")
+
+    def get(
+        self, session: str, logger_start_time: int, logger_end_time: int, software_version: str
+    ) -> Optional[sqlite3.Row]:
+        return self.connection.execute(
+            "SELECT * FROM jobs WHERE session = ? AND logger_start_time = ? "
+            "AND logger_end_time = ? AND software_version = ?",
+            (session, logger_start_time, logger_end_time, software_version),
+        ).fetchone()
+
+    def needs_submission(
+        self, session: str, logger_start_time: int, logger_end_time: int, software_version: str
+    ) -> bool:
+        row = self.get(session, logger_start_time, logger_end_time, software_version)
+        return row is None or row["state"] in RESUBMIT_STATES
+
+    def record_submission(
+        self,
+        session: str,
+        logger_start_time: int,
+        logger_end_time: int,
+        software_version: str,
+        job_id: Optional[str],
+        state: str,
+        gt_files: List[str],
+    ):
+        now = self.now()
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?, ?)",
+                (
+                    session,
+                    logger_start_time,
+                    logger_end_time,
+                    software_version,
+                    job_id,
+                    state,
+                    json.dumps(gt_files),
+                    now,
+                    now,
+                ),
+            )
+
+    def update_state(self, job_id: str, state: str, output_path: Optional[str] = None):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET state = ?, output_path = COALESCE(?, output_path), "
+                "updated_at = ? WHERE job_id = ?",
+                (state, output_path, self.now(), job_id),
+            )
+
+    def pending_job_ids(self) -> List[str]:
+        placeholders = ", ".join("?" for _ in TERMINAL_STATES)
+        return [
+            row["job_id"]
+            for row in self.connection.execute(
+                f"SELECT job_id FROM jobs WHERE job_id IS NOT NULL "
+                f"AND state NOT IN ({placeholders})",
+                sorted(TERMINAL_STATES),
+            )
+        ]
+
+    def unknown_id_rows(self) -> List[sqlite3.Row]:
+        """Returns the windows whose submission response had no job id."""
+        return self.connection.execute(
+            "SELECT * FROM jobs WHERE state = ? ORDER BY session, logger_start_time",
+            (STATE_UNKNOWN_ID,),
+        ).fetchall()
+
+    def rows(self) -> List[sqlite3.Row]:
+        return self.connection.execute(
+            "SELECT * FROM jobs ORDER BY session, logger_start_time"
+        ).fetchall()
+
+    def evaluation_pairs(self) -> List[Tuple[str, str]]:
+        """Returns (GT file, reprocessed parquet) for every GT file of a successful job with an output."""
+        placeholders = ", ".join("?" for _ in SUCCESS_STATES)
+        return [
+            (gt_file, row["output_path"])
+            for row in self.connection.execute(
+                f"SELECT gt_files, output_path FROM jobs WHERE output_path IS NOT NULL "
+                f"AND state IN ({placeholders}) ORDER BY session, logger_start_time",
+                sorted(SUCCESS_STATES),
+            )
+            for gt_file in json.loads(row["gt_files"] or "[]")
+        ]
@@ -0,0 +1,165 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+from .pipeline_metrics import PipelineMetrics, measure
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Seconds to wait for the connection and for each read before the request is retried
+REQUEST_TIMEOUT_S = 60.0
+# Sent with every attempt of one submission, so RAAS can tell a retried POST from a new job
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+
+class TokenBucket:
+    """Thread-safe token bucket that allows `rate_per_s` acquisitions per second with bursts of `burst`."""
+
+    def __init__(self, rate_per_s: float, burst: int = 1):
+        self.rate_per_s = rate_per_s
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.last_refill) * self.rate_per_s
+                )
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_s = (1 - self.tokens) / self.rate_per_s
+            time.sleep(wait_s)
+
+
+class RaasJobSubmitter:
+    """Submits RAAS jobs concurrently over one keep-alive session.
+
+    Requests are rate limited by a token bucket and retried with exponential backoff on
+    connection errors, timeouts and 429/5xx responses, honouring `Retry-After` when it is
+    given. All attempts of one submission carry the same idempotency key, so a POST that
+    reached RAAS before its connection dropped does not create a second job.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        logger: logging.Logger,
+        submit_job_url: str,
+        max_workers: int = 8,
+        rate_per_s: float = 5.0,
+        burst: int = 5,
+        max_retries: int = 5,
+        backoff_s: float = 1.0,
+        verify: bool = False,
+        timeout_s: float = REQUEST_TIMEOUT_S,
+        metrics: Optional[PipelineMetrics] = None,
+    ):
+        self.submit_job_url = submit_job_url
+        self.logger = logger
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.verify = verify
+        self.timeout_s = timeout_s
+        self.metrics = metrics
+        self.rate_limiter = TokenBucket(rate_per_s, burst)
+
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(username, password)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def retry_delay_s(self, attempt: int, response: Optional[requests.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff_s * 2**attempt
+
+    def send(self, method: str, url: str, description: str, **kwargs) -> requests.Response:
+        """Sends one rate-limited request and retries it on connection errors, timeouts and 429/5xx."""
+        kwargs.setdefault("timeout", self.timeout_s)
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            response = None
+            try:
+                response = self.session.request(method, url, verify=self.verify, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                reason = f"status code {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                reason = str(e)
+
+            if attempt == self.max_retries:
+                return response
+            delay_s = self.retry_delay_s(attempt, response)
+            self.logger.warning(
+                f"{description} failed with {reason}, retrying in {delay_s} seconds"
+            )
+            time.sleep(delay_s)
+
+    def submit(self, request_body: dict) -> requests.Response:
+        with measure(self.metrics, "raas_submit", request_body.get("session")) as record:
+            record["bytes_written"] = len(json.dumps(request_body))
+            response = self.send(
+                "POST",
+                self.submit_job_url,
+                f"Submitting job for session {request_body.get('session')}",
+                json=request_body,
+                headers={IDEMPOTENCY_KEY_HEADER: uuid.uuid4().hex},
+            )
+            record["success"] = response is not None and response.ok
+            if response is not None:
+                record["bytes_read"] = len(response.content)
+        return response
+
+    def get_job(self, job_id: str) -> requests.Response:
+        return self.send(
+            "GET",
+            f"{self.submit_job_url.rstrip('/')}/{job_id}",
+            f"Polling job {job_id}",
+        )
+
+    def map_concurrently(self, function, items: List) -> List:
+        """Applies `function` to all items from the worker pool; exceptions are returned, not raised."""
+
+        def call_or_error(item):
+            try:
+                return function(item)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(call_or_error, items))
+
+    def submit_all(
+        self, request_bodies: List[dict]
+    ) -> List[Tuple[dict, Union[requests.Response, Exception]]]:
+        """Submits all request bodies and returns (body, response or exception) in input order."""
+        return list(zip(request_bodies, self.map_concurrently(self.submit, request_bodies)))
+
+    def get_jobs(
+        self, job_ids: List[str]
+    ) -> List[Tuple[str, Union[requests.Response, Exception]]]:
+        """Polls all jobs and returns (job id, response or exception) in input order."""
+        return list(zip(job_ids, self.map_concurrently(self.get_job, job_ids)))
@@ -0,0 +1,60 @@
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+
+class ReprocessingWindow:
+    """A padded logger window of one session and the GT files it covers."""
+
+    def __init__(self, session: str, logger_start_time: int, logger_end_time: int):
+        self.session = session
+        self.logger_start_time = logger_start_time
+        self.logger_end_time = logger_end_time
+        self.gt_files: List[Path] = []
+
+    def __repr__(self):
+        return (
+            f"ReprocessingWindow(session={self.session!r}, "
+            f"logger_start_time={self.logger_start_time}, "
+            f"logger_end_time={self.logger_end_time}, gt_files={len(self.gt_files)})"
+        )
+
+
+def plan_reprocessing_windows(
+    gt_windows: Iterable[Tuple[Path, str, int, int]],
+    start_offset_ns: int,
+    end_offset_ns: int,
+    gap_tolerance_ns: int = 0,
+) -> List[ReprocessingWindow]:
+    """Groups GT windows by session and merges their padded windows.
+
+    `gt_windows` holds (gt_file, session, start_timestamp, end_timestamp). Each window is
+    padded by the offsets, and padded windows of the same session that overlap or are at
+    most `gap_tolerance_ns` apart are merged, so one job covers all of them.
+    """
+    windows_by_session: Dict[str, List[Tuple[int, int, Path]]] = defaultdict(list)
+    for gt_file, session, start_timestamp, end_timestamp in gt_windows:
+        windows_by_session[session].append(
+            (
+                int(start_timestamp) - start_offset_ns,
+                int(end_timestamp) + end_offset_ns,
+                gt_file,
+            )
+        )
+
+    planned_windows: List[ReprocessingWindow] = []
+    for session in sorted(windows_by_session):
+        current = None
+        for logger_start_time, logger_end_time, gt_file in sorted(
+            windows_by_session[session], key=lambda window: window[:2]
+        ):
+            if (
+                current is None
+                or logger_start_time - current.logger_end_time > gap_tolerance_ns
+            ):
+                current = ReprocessingWindow(session, logger_start_time, logger_end_time)
+                planned_windows.append(current)
+            else:
+                current.logger_end_time = max(current.logger_end_time, logger_end_time)
+            current.gt_files.append(gt_file)
+    return planned_windows
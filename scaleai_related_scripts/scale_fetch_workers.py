@@ -0,0 +1,188 @@
+import ast
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import runpy
+import sys
+import traceback
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+FETCH_SCRIPT_NAME = "fetch_merged_scale_response.py"
+# Seconds a worker may take to start and load the fetch script
+WORKER_START_TIMEOUT_S = 120
+
+
+class FetchWorkerUnavailable(Exception):
+    """A worker could not load the fetch script; fetch with a subprocess instead."""
+
+
+def has_main_guard(script_path: Path) -> bool:
+    """Returns whether the script defines `main()` and only runs it under `if __name__ == "__main__"`.
+
+    Only such a script can be imported once and called per task; any other script is run
+    as `__main__` for every task, which still reuses the modules it imported.
+    """
+    tree = ast.parse(script_path.read_text(), str(script_path))
+    has_main = any(
+        isinstance(node, ast.FunctionDef) and node.name == "main" for node in tree.body
+    )
+    has_guard = any(
+        isinstance(node, ast.If)
+        and isinstance(node.test, ast.Compare)
+        and isinstance(node.test.left, ast.Name)
+        and node.test.left.id == "__name__"
+        for node in tree.body
+    )
+    return has_main and has_guard
+
+
+def exit_code(exit_exception: SystemExit) -> int:
+    if exit_exception.code is None:
+        return 0
+    return exit_exception.code if isinstance(exit_exception.code, int) else 1
+
+
+def worker_main(connection, scaleai_script_path: str, script_name: str):
+    """Loads the fetch script once, then runs it for every task id received until None arrives."""
+    os.chdir(scaleai_script_path)
+    sys.path.insert(0, scaleai_script_path)
+    script_path = Path(scaleai_script_path) / script_name
+    try:
+        main = None
+        if has_main_guard(script_path):
+            main = runpy.run_path(str(script_path), run_name="scale_fetch_worker")["main"]
+    except BaseException:
+        connection.send(("error", traceback.format_exc()))
+        return
+    connection.send(("ready", None))
+
+    while True:
+        task_id = connection.recv()
+        if task_id is None:
+            return
+        sys.argv = [script_name, f"--scale_task_id={task_id}"]
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                if main is not None:
+                    main()
+                else:
+                    runpy.run_path(str(script_path), run_name="__main__")
+                returncode = 0
+            except SystemExit as e:
+                returncode = exit_code(e)
+            except BaseException:
+                traceback.print_exc()
+                returncode = 1
+        connection.send((returncode, stdout.getvalue(), stderr.getvalue()))
+
+
+class FetchWorker:
+    def __init__(self, context, scaleai_script_path: str, script_name: str):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=worker_main,
+            args=(child_connection, scaleai_script_path, script_name),
+            daemon=True,
+        )
+        self.process.start()
+        child_connection.close()
+        if not self.connection.poll(WORKER_START_TIMEOUT_S):
+            self.kill()
+            raise FetchWorkerUnavailable(
+                f"Fetch worker did not start within {WORKER_START_TIMEOUT_S} seconds"
+            )
+        try:
+            status, error = self.connection.recv()
+        except EOFError:
+            status, error = "error", f"Fetch worker exited with code {self.process.exitcode}"
+        if status != "ready":
+            self.kill()
+            raise FetchWorkerUnavailable(error)
+
+    def fetch(self, task_id: str, timeout_s: Optional[float]) -> Optional[Tuple[int, str, str]]:
+        """Returns (return code, stdout, stderr), or None if the worker timed out or died."""
+        self.connection.send(task_id)
+        if not self.connection.poll(timeout_s):
+            return None
+        try:
+            return self.connection.recv()
+        except EOFError:
+            return None
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.kill()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class ScaleFetchWorkerPool:
+    """Long-lived processes that each load the Scale fetch script once and fetch one task at a time.
+
+    A fetch hands the task id to an idle worker over its pipe, which saves the interpreter
+    startup, imports and API client setup that a subprocess per task pays. Workers are
+    started on first use; a worker that times out or dies is killed and replaced.
+    """
+
+    def __init__(
+        self,
+        scaleai_script_path: str,
+        workers: int,
+        logger: logging.Logger,
+        script_name: str = FETCH_SCRIPT_NAME,
+    ):
+        self.scaleai_script_path = str(Path(scaleai_script_path).resolve())
+        self.script_name = script_name
+        self.logger = logger
+        # Spawned rather than forked, as the fetcher threads may hold locks while forking
+        self.context = multiprocessing.get_context("spawn")
+        # Holds one slot per worker; a slot is a started worker or None for one to be started
+        self.idle_workers: queue.Queue = queue.Queue()
+        for _ in range(workers):
+            self.idle_workers.put(None)
+        self.started_workers: List[FetchWorker] = []
+
+    def fetch(self, task_id: str, timeout_s: Optional[float] = None) -> Tuple[int, str, str]:
+        """Fetches a task and returns (return code, stdout, stderr) like the subprocess would.
+
+        Raises FetchWorkerUnavailable if a worker cannot load the fetch script.
+        """
+        worker = self.idle_workers.get()
+        try:
+            if worker is None:
+                worker = FetchWorker(self.context, self.scaleai_script_path, self.script_name)
+                self.started_workers.append(worker)
+        except FetchWorkerUnavailable:
+            self.idle_workers.put(None)
+            raise
+
+        result = worker.fetch(task_id, timeout_s)
+        if result is None:
+            self.logger.error(
+                f"Fetch worker for task_id: {task_id} timed out after {timeout_s} seconds "
+                "or died, restarting it"
+            )
+            worker.kill()
+            self.started_workers.remove(worker)
+            self.idle_workers.put(None)
+            return -1, "", ""
+        self.idle_workers.put(worker)
+        return result
+
+    def close(self):
+        for worker in self.started_workers:
+            worker.stop()
+        self.started_workers = []
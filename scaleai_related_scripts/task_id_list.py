@@ -1,279 +0,0 @@
-list_of_task_ids_legacy = [
-    "66c9e9717b817ad92c208f33",
-    "66c9e02206aae268cd1e7362",
-    "66c9e16fe7acf32c6633af03",
-    "66e09a5c9467f38ca2e79d79",
-    "66dbc234454ba66877647f7b",
-    "66dbc0fa874abfa206d3760e",
-    "66e09a05e3b688676b1ba7df",
-    "66e09be54eba60acd8a85d19",
-    "66dbc06a0c8f0441490cdd84",
-    "66dbc11bdda35143db5e8c27",
-    "66e09bb82b18c98d40c53af3",
-    "66dbc1593e2173d5039c9099",
-    "66e09991598615b6abb531c3",
-    "66dbc12659de5256eb4ef0c3",
-    "66e0a1eacfc71154e1c9b0b6",
-    "66e0a1e0157ca3a6b4c0f498",
-    "66dbc14fa7389e6b44610f90",
-    "66e0a22b093f5651e7b7cc5b",
-    "66dbc0962fbc2077f397549f",
-    "66e09bb82b18c98d40c53af3",
-    "66e0999ac2ee334a203f758e",
-    "66e0a16b97814419169e1ca5",
-    "66e0a1fc199293eb437155ad",
-    "66e099c5a1f38d44ecd7bd5e",
-    "66dbc1efa43aaf91c9eeb486",
-    "66dbc22b366f96bab9344040",
-    "66e09bc5eb18ea3e49a019a0",
-    "66e09a3bcb3686a083aa7c8e",
-    "66e09a5c9467f38ca2e79d79",
-    "66e09b7732b042d1f4d6c655",
-    "66dbc2184650a9b3792a876d",
-    "66e09b6eb5c4cb447a0d846a",
-    "66dbc0f186394e89d1f256d8",
-    "66dbc256667114fac8b02717",
-    "66dbc16dff10fd9829255758",
-    "66dbc1642903d568c48c438c",
-    "66dbc185acb34ca91d0273cb",
-    "66e0a20b2626aca9c6862894",
-    "66dbc1d0a7b62be02d1551ec",
-    "66e0a235b3fadb78e91c33b5",
-    "66dbc14403b3d2f9810e280f",
-    "66dbc07e0217407a45dde579",
-    "66e099e578b07b64dd07d42f",
-    "66dbc111ff10fd9829254c61",
-    "66e09bf9d75cde4311f52f79",
-    "66dbc1db64d2012f4fb1ed9e",
-    "66e0a1f322474d55281f1b62",
-    "66dbc199a43aaf91c9eeae77",
-    "66dbc20c366f96bab9343216",
-    "66dbc0c81fc5895860ccce09",
-    "66e099fb619c4df8ae67ab74",
-    "66dbc13aa7389e6b44610e43",
-    "66e0a1a76518bc4bbef5bb86",
-    "66e0a19e105d5b167fe04fc2",
-    "66dbc28176ba2c00bf0a8b3a",
-    "66dbc260667114fac8b02800",
-    "66dbc0d1667114fac8aff9c2",
-    "66e099a68c8dcf689e39e2cf",
-    "66dbc24b64d2012f4fb1fbfd",
-    "66e0a1b2a75e1f89ef7af380",
-    "66dbc10592d848b23a74f2e0",
-    "66e099dc3d6f6aeaf70fb26e",
-    "66dbc1e6dda35143db5e96ff",
-    "66e09b8cbc797eea42f92485",
-    "66e09c052b17177beb1c05ee",
-    "66dbc1b4667114fac8b01245",
-    "66dbc0dd4db5814b84c4f27d",
-    "66dbc1a82fc2e8cd21edf4e2",
-    "66e0a1802947c8820bea4e58",
-    "66e099b08c1532218ec7e454",
-    "66dbc179366f96bab934203a",
-    "66dbc2012605dfccbb367763",
-    "66dbc0e5f5ef831f9cb91d2d",
-    "66e0a16264b344afef2f5881",
-    "66dbc09f59de5256eb4ee4a8",
-    "66dbc26eacb34ca91d028495",
-    "66e09a263a730487b2255077",
-    "66e099b9eb18ea3e499fc313",
-    "66dbc27892d848b23a750bb8",
-    "66e099f0619c4df8ae67a25e",
-    "66dbc08a9d2ee2254a24f5ad",
-    "66dbc18fe5d1bfce87eaf5e9",
-    "66dbc1c42903d568c48c4d46",
-    "66e09a0d3d5b2ba24b7fa817",
-    "66e09a17e64b619a1646333e",
-    "66e09baede52747354797ca7",
-    "66dbc2213e2173d5039cab69",
-    "66e09a47dd21926efb7faba0",
-    "66e09a31f148f9e5972d89ae",
-    "66dbc0604650a9b3792a628a",
-    "66dbc1f8d2f1a7a4edbd06d8",
-    "66dbc130db8036dd075a2fb1",
-]
-
-list_of_task_ids_others = [
-    "67452ff5bddbc705f4939ae6",
-    "674530bdb9fba01759d72320",
-    "6745307847aea1f6468a2b91",
-    "6745303974de8ad4e81c569d",
-    "6745310252a3f7bee2c89cd3",
-    "6745308288f77d3c81538537",
-    "674530eee8b0dc7d0d5a1e94",
-    "674530a888f77d3c81538ad0",
-    "674530b3b9fba01759d7220f",
-    "67452feb75db6eb6b6d6d0e7",
-    "6745309fb2c2df35b2b09bda",
-    "67452eef65a387cffcb83190",
-    "6745306f47aea1f6468a2a96",
-    "67452f5075db6eb6b6d6bb7b",
-    "67452f739614ced836bf395a",
-    "67452f99aff8ad9bcad2cc02",
-    "6745316259ce0606ac2fa997",
-    "6740f1d24807ac54030a33d9",
-    "674530527dd4e0010bec619d",
-    "67452eb6d4fb0be77bcd19d7",
-    "6745305974de8ad4e81c5cb9",
-    "67452f0cbce37a3023068251",
-    "6745302fd4fb0be77bcd370d",
-    "674530f8b9fba01759d72620",
-    "67452fa1bddbc705f49393b7",
-    "67453138fa60b0ea29ec15e8",
-    "67452f8f74de8ad4e81c4b23",
-    "67452fc5aff8ad9bcad2ceda",
-    "6740f1def65ff89f928e59dd",
-    "674f2bdd3bcb37c8361bd01b",
-    "674f2c05e4d01542aab45e6d",
-    "674f2cb2369f11897b1adb48",
-    "674f2c45e4d01542aab46af9",
-    "674f2c81b81c5b3f31bfb2df",
-    "674f2c197b53fb1f8b43cdbf",
-    "674f2d1d54fba0a4185f5853",
-    "674f2cf83b605a7ee72cfdb0",
-    "674f2cde3b605a7ee72cfb07",
-    "674f2c3be04c0fd9e4aa8d44",
-    "674f2d3bdcaaeca97cb35035",
-    "674f2be9ffe80046f2b34cbf",
-    "674f2ccb9689e65b8aa4e5ed",
-    "674f2c9fe7c2430a356d63be",
-    "674f2cbae97fbcda7a468aee",
-]
-
-list_of_task_ids_prediction = [
-    "6740edbdc4d4fb995633b047",
-    "6740edc98d8e980043f457ec",
-    "6740edcfcc3dd8758b8f1164",
-    "6740edb637068390b6521594",
-    "6740edc3254df7117b20ca4c",
-    "6740f1def65ff89f928e59dd",
-    "6740f1ef04177b3df386c98b",
-    "6740f1f5ddffb496be191008",
-    "6740f1d76ebd08d125109b5c",
-    "6740f1e4043697233c902688",
-    "6740f1d24807ac54030a33d9",
-    "6740f1ea36c75a1161e6e3a3",
-    "6740f1cc5982cccf831f8109",
-    "6759dcc0130e429cc479508a",
-    "6759dc820ef3c682a527f7e0",
-    "6759dd08e52df5ff8f6be955",
-    "6759dc79bec3bdec452bb796",
-    "6759dc9a7be71e350569a520",
-    "6759dcf6ccd038b9b9fc0e4b",
-    "6759dcacd79e8da94083e3a3",
-    "6759dcc6e9658cce014db400",
-    "6759dca3d79e8da94083e145",
-    "6759dd401b3d9a6c57aa7824",
-    "6759dd39f32f70397f27a6fb",
-    "6759dd4aa18b7584773ad956",
-    "6759dc90f32f70397f279751",
-    "6759dd336a209a7adbe761c4",
-    "6759dccb2310d7f32d50f465",
-    "6759dd227f35635c709b5361",
-    "6759dd447be71e350569b931",
-    "6759dcd1cb162d0a625ff4f8",
-    "6759dd2ad79e8da940840300",
-    "674f2d1d54fba0a4185f5853",
-    "6759dcff1d40785c26fff495",
-    "6759dcd9a3161d835587d969",
-    "6759dd1a422b5f5b7f436ddd",
-    "6759dced4f49168527f17a80",
-    "6759dce5130e429cc4795473",
-    "6759dc9a7be71e350569a520",
-    "6759dcf6ccd038b9b9fc0e4b",
-    "6759dcacd79e8da94083e3a3",
-    "6759dcc6e9658cce014db400",
-    "6759dca3d79e8da94083e145",
-    "6759dd401b3d9a6c57aa7824",
-    "6759dd39f32f70397f27a6fb",
-    "6759dd4aa18b7584773ad956",
-    "6759dc90f32f70397f279751",
-    "6759dd336a209a7adbe761c4",
-    "6759dccb2310d7f32d50f465",
-    "6759dd227f35635c709b5361",
-    "6759dd447be71e350569b931",
-    "6759dcd1cb162d0a625ff4f8",
-    "6759dd2ad79e8da940840300",
-    "6759dcff1d40785c26fff495",
-    "6759dcd9a3161d835587d969",
-    "6759dd1a422b5f5b7f436ddd",
-    "6759dced4f49168527f17a80",
-    "6759dce5130e429cc4795473",
-    "6762213b2a01a25f86f18e26",
-    "6762219ea5f650343518db0f",
-    "6762203a89d6819a9f5dbf01",
-    "67622092430f4f3cc5a8410f",
-    "67621fd17a6bc4aebb75b740",
-    "676221197a6bc4aebb75d329",
-    "67621f9533c19737115d6c68",
-    "67622195d9a404a433275a39",
-    "67621f8cf00708184ca7a5e2",
-    "67621feca5f650343518af2a",
-    "6762217a346a1db40148c560",
-    "67622015e35e2e81e0bf2df7",
-    "676220cd79ae9a33495177ec",
-    "67621ff521d532b98952f033",
-    "67622267e49cb60ee53526e8",
-    "6762221a0a3e65e821036fc9",
-    "67622212e2cbf0172a9d0327",
-    "6762200c3809c46873b6475f",
-    "6762226fee0a5b12628df179",
-    "67621fa6894d3de3fd220aa3",
-    "676221d3b7be5f980943db25",
-    "676220d6d9a404a4332741b0",
-    "676221c1b6d4930b77a73568",
-    "6762222c8affb9da3488074d",
-    "676220f88e00ceba4a9fc2d0",
-    "676221ca6e573e3f77076c32",
-    "6762209b79ae9a33495174d2",
-    "67622158d769e614184887c6",
-    "676220608e00ceba4a9b93af",
-    "6762208a8043663cdb5f8ba6",
-    "676221836f8094167c16b365",
-    "67622129d9a404a433274ae8",
-    "676220efd5dc7f8d3fc6713c",
-    "676221b8513546279293198c",
-    "676221325135462792930a0e",
-    "676221a62db89497dda176e6",
-    "6762216ad769e61418488971",
-    "67622172c45d687bc4e087b8",
-    "6762220014b2bf36f45ccf4d",
-    "67622081a5f650343518c112",
-    "6762216033c19737115d85ea",
-    "67621fc8736259e3c8e81053",
-    "676220b02b51ecbb0d6be12c",
-    "67622026e35e2e81e0bf2fcc",
-    "6762201f189b562d4f93e3e2",
-    "6762203284b1e1a6f5fb0745",
-    "676222392fa2d2a32b43c272",
-    "6762204ee35e2e81e0bf33e1",
-    "67622272880bec7f6b2210d7",
-    "676220046d7e7ec00de45f49",
-    "676220ffaa63011319cc1b06",
-    "67621f9e0f22e965d49d34fc",
-    "676221073793084bc8e59115",
-    "67621fe332a93d256d80eb1c",
-    "676220de3793084bc8e58d44",
-    "676221af8ac5a59f9fd84662",
-    "67622058b7be5f980943c24c",
-    "67622223c5137244492ba5db",
-    "6762204585b542d2c1c8be2c",
-    "676220697a6bc4aebb75c54c",
-    "67621fb89c9c448ef62d17be",
-    "676221102764731b2c768881",
-    "67621fafaa63011319c7af07",
-    "676221dc2b51ecbb0d6bfa04",
-    "67622241c45d687bc4e095b6",
-    "676222089ef41c8bcbbdb402",
-    "6762218bb7be5f980943d67c",
-    "67621ffdf00708184ca7b9ed",
-    "676221ed6e573e3f77076c86",
-    "676221e55135462792932066",
-    "676220c2f00708184ca7c855",
-    "676220ba38dff72c1608173c",
-    "67621fc06f8094167c16ab63",
-    "676220e7334cda912dc07866",
-    "676220a8f00708184ca7c559",
-    "676221f72fc180ef79eae68c",
-    "67621fda8e00ceba4a9b7a52",
-]
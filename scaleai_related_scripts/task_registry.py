@@ -0,0 +1,123 @@
+import datetime
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .gt_storage import TASK_STATUS_FILENAME
+
+# Registry of the Scale tasks and their tags, tracked in this repo next to this module
+REGISTRY_PATH = Path(__file__).with_name("task_registry.json")
+
+TAG_LEGACY = "legacy"
+TAG_PREDICTION = "prediction"
+TAG_OTHERS = "others"
+
+STATUS_NEW = "new"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUSES = [STATUS_NEW, STATUS_DONE, STATUS_FAILED]
+
+
+def write_json_atomically(file_path: Path, data: dict):
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    with open(tmp_path, "w") as file:
+        json.dump(data, file, indent=2, sort_keys=True)
+        file.write("\n")
+    os.replace(tmp_path, file_path)
+
+
+def read_json_if_exists(file_path: Path) -> dict:
+    if not file_path.exists():
+        return {}
+    with open(file_path, "r") as file:
+        return json.load(file)
+
+
+class TaskRegistry:
+    """Set of the Scale task ids the pipeline processes, with their tags and status.
+
+    Each task id is a key of the tracked registry file, so it is listed once however many
+    tags it has. The status of every task is kept per GT base path in `.task_status`, next
+    to the fetch manifest, so a new snapshot starts with every task new. Both files are
+    only read on the first access.
+    """
+
+    def __init__(self, base_path: str, registry_path=REGISTRY_PATH):
+        self.registry_path = Path(registry_path)
+        self.status_path = Path(base_path) / TASK_STATUS_FILENAME
+        self._entries: Optional[Dict[str, dict]] = None
+        self._statuses: Optional[Dict[str, dict]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def entries(self) -> Dict[str, dict]:
+        if self._entries is None:
+            self._entries = read_json_if_exists(self.registry_path)
+        return self._entries
+
+    @property
+    def statuses(self) -> Dict[str, dict]:
+        if self._statuses is None:
+            self._statuses = read_json_if_exists(self.status_path)
+        return self._statuses
+
+    def save(self):
+        """Writes the tags back to the registry file."""
+        with self._lock:
+            write_json_atomically(self.registry_path, self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self.entries
+
+    def get(self, task_id: str) -> Optional[dict]:
+        return self.entries.get(task_id)
+
+    def status(self, task_id: str) -> str:
+        return self.statuses.get(task_id, {}).get("status", STATUS_NEW)
+
+    def add(self, task_ids: Iterable[str], tags: Iterable[str] = ()) -> List[str]:
+        """Adds the tasks with `tags`, merging the tags of known tasks; returns the new task ids."""
+        new_task_ids = []
+        with self._lock:
+            for task_id in task_ids:
+                entry = self.entries.get(task_id)
+                if entry is None:
+                    entry = self.entries[task_id] = {"tags": []}
+                    new_task_ids.append(task_id)
+                entry["tags"] = sorted(set(entry["tags"]) | set(tags))
+        return new_task_ids
+
+    def select(
+        self, tags: Optional[Iterable[str]] = None, statuses: Optional[Iterable[str]] = None
+    ) -> List[str]:
+        """Returns the sorted ids of the tasks with any of `tags` and any of `statuses`.
+
+        None selects every tag or status.
+        """
+        tags = None if tags is None else set(tags)
+        statuses = None if statuses is None else set(statuses)
+        return sorted(
+            task_id
+            for task_id, entry in self.entries.items()
+            if (tags is None or tags.intersection(entry["tags"]))
+            and (statuses is None or self.status(task_id) in statuses)
+        )
+
+    def tags(self) -> List[str]:
+        return sorted({tag for entry in self.entries.values() for tag in entry["tags"]})
+
+    def set_status(self, task_ids: Iterable[str], status: str):
+        """Records the status of the tasks in the status file of the GT base path."""
+        if status not in STATUSES:
+            raise ValueError(f"Unknown task status {status!r}, expected one of {STATUSES}")
+        updated_at = datetime.datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            for task_id in task_ids:
+                self.statuses[task_id] = {"status": status, "updated_at": updated_at}
+            self.status_path.parent.mkdir(parents=True, exist_ok=True)
+            write_json_atomically(self.status_path, self.statuses)
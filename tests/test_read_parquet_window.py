@@ -0,0 +1,33 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+# The example needs the eval tools of the ddad repo, so this only runs where they are installed
+object_prediction_gt_example = pytest.importorskip("object_prediction_gt_example")
+
+
+def write_predictions(parquet_file, unit: str):
+    timestamps_ns = [1_000_000_000 + index * 100_000_000 for index in range(100)]
+    table = pa.table(
+        {
+            "ID_HF": list(range(100)),
+            "timestamp": pa.array(
+                pd.to_datetime(timestamps_ns, unit="ns").as_unit(unit), pa.timestamp(unit)
+            ),
+        }
+    )
+    pq.write_table(table, parquet_file, row_group_size=10)
+    return timestamps_ns
+
+
+@pytest.mark.parametrize("unit", ["us", "ns"])
+def test_reads_the_rows_of_the_gt_window_whatever_the_timestamp_unit(tmp_path, unit):
+    parquet_file = tmp_path / "predictions.parquet"
+    timestamps_ns = write_predictions(parquet_file, unit)
+
+    frame = object_prediction_gt_example.read_parquet_window(
+        str(parquet_file), timestamps_ns[25], timestamps_ns[44], columns=["ID_HF"]
+    )
+
+    assert frame["ID_HF"].tolist() == list(range(25, 45))
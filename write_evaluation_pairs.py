@@ -0,0 +1,29 @@
+import argparse
+import pandas as pd
+from scaleai_related_scripts.raas_job_ledger import RaasJobLedger
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Write the GT JSON / reprocessed parquet pairs of the successful RAAS jobs "
+        "to a csv for `object_prediction_gt_example.py --pairs`."
+    )
+    parser.add_argument("directory", type=str, help="GT base path holding the RAAS job ledger")
+    parser.add_argument("--ledger", type=str, default=None, help="Path of the ledger, if not in the GT base path")
+    parser.add_argument("--output", type=str, default="evaluation_pairs.csv", help="Csv the pairs are written to")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    ledger = RaasJobLedger(args.directory, args.ledger)
+    try:
+        pairs = ledger.evaluation_pairs()
+    finally:
+        ledger.close()
+    pd.DataFrame(pairs, columns=["json", "parquet"]).to_csv(args.output, index=False)
+    print(f"Wrote {len(pairs)} GT/parquet pairs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()